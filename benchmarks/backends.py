@@ -0,0 +1,112 @@
+"""Compare the CPU inference backends on tokens/sec and resident memory.
+
+Each backend is measured in its own subprocess so load-time allocations and
+resident memory don't bleed between runs:
+
+    python benchmarks/backends.py --backends torch torch-int8 onnx --output backends.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def resident_memory_mb() -> float:
+    """Current resident set size of this process, from /proc (Linux) or getrusage peak elsewhere"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def measure(backend: str, model_id: str, new_tokens: int, runs: int) -> dict:
+    """Load one backend in this process and time generation of a fixed number of tokens"""
+    os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+    sys.path.insert(0, ROOT)
+    import optiforce_app
+    import transformers  # noqa: F401 -- keep library import cost out of the model's memory figure
+
+    rss_before = resident_memory_mb()
+    manager = optiforce_app.ModelManager(model_id=model_id, load_mode="lazy", backend=backend)
+    manager.start()
+    if not manager.wait():
+        return {"backend": backend, "error": manager.error}
+    rss_loaded = resident_memory_mb()
+
+    scenarios = optiforce_app.optimization_engine.generate_scenarios("software-engineer", "usa", 25, "balanced", "both")
+    prompt = optiforce_app.LightweightLLMService(manager).build_prompt(scenarios, "software-engineer")
+    tokenizer, model = manager.tokenizer, manager.model
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    kwargs = dict(max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+
+    model.generate(**inputs, **dict(kwargs, max_new_tokens=2, min_new_tokens=2))  # warm-up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        outputs = model.generate(**inputs, **kwargs)
+        timings.append(time.perf_counter() - started)
+    generated = int(outputs.shape[1] - inputs["input_ids"].shape[1])
+    best = min(timings)
+
+    return {
+        "backend": backend,
+        "model_id": model_id,
+        "load_seconds": manager.load_seconds,
+        "prompt_tokens": int(inputs["input_ids"].shape[1]),
+        "generated_tokens": generated,
+        "best_seconds": best,
+        "tokens_per_second": generated / best,
+        "rss_mb": resident_memory_mb(),
+        "model_rss_mb": rss_loaded - rss_before
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OptiForce inference backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--model", default=os.environ.get("OPTIFORCE_MODEL_ID", "microsoft/Phi-3-mini-4k-instruct"))
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.model, args.new_tokens, args.runs)))
+        return
+
+    results = []
+    for backend in args.backends:
+        command = [sys.executable, os.path.abspath(__file__), "--child", backend, "--model", args.model,
+                   "--new-tokens", str(args.new_tokens), "--runs", str(args.runs)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        lines = completed.stdout.strip().splitlines()
+        try:
+            result = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            result = {"backend": backend, "error": completed.stderr.strip().splitlines()[-1:] or "no output"}
+        results.append(result)
+        if "error" in result:
+            print(f"{backend:>12}: failed ({result['error']})")
+        else:
+            print(f"{backend:>12}: {result['tokens_per_second']:8.1f} tok/s  {result['rss_mb']:8.0f} MB RSS  "
+                  f"(model {result['model_rss_mb']:.0f} MB, load {result['load_seconds']:.1f}s)")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
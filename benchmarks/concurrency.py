@@ -0,0 +1,161 @@
+"""Compare the sync (gunicorn) and async (uvicorn + optiforce_asgi) serving modes under concurrent load.
+
+Both modes run the same number of worker processes against a stub inference
+server that takes --generation-ms per explanation, so every /api/optimize call
+spends most of its time waiting on generation. While --concurrency clients keep
+/api/optimize busy, a prober times /api/locations to show whether cheap
+endpoints still get through:
+
+    python benchmarks/concurrency.py --workers 2 --concurrency 16 --output concurrency.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_COMMANDS = {
+    "sync": lambda port, workers: ["gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+                                   "--timeout", "120", "optiforce_app:app"],
+    "async": lambda port, workers: [sys.executable, "-m", "uvicorn", "optiforce_asgi:app", "--host", "127.0.0.1",
+                                    "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+}
+
+
+def request(port: int, method: str, path: str, body=None, timeout: float = 120.0):
+    """One request on a fresh connection; returns (status, seconds)"""
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        connection.request(method, path, body=payload, headers={"Content-Type": "application/json"} if payload else {})
+        response = connection.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - started
+    finally:
+        connection.close()
+
+
+def wait_until_up(port: int, deadline: float) -> None:
+    while time.time() < deadline:
+        try:
+            if request(port, "GET", "/healthz", timeout=1.0)[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies) -> dict:
+    return {
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000.0,
+        "p95_ms": percentile(latencies, 0.95) * 1000.0,
+        "p99_ms": percentile(latencies, 0.99) * 1000.0,
+        "max_ms": max(latencies) * 1000.0 if latencies else float("nan")
+    }
+
+
+def run_load(port: int, concurrency: int, duration: float) -> dict:
+    """Keep ``concurrency`` optimize calls in flight and probe /api/locations alongside them"""
+    stop_at = time.perf_counter() + duration
+    optimize, probes, errors = [], [], []
+    counter = iter(range(1, 10 ** 9))
+    lock = threading.Lock()
+
+    def optimizer():
+        while time.perf_counter() < stop_at:
+            with lock:
+                headcount = next(counter)  # distinct inputs, so neither coalescing nor the explanation cache kicks in
+            try:
+                status, seconds = request(port, "POST", "/api/optimize", {
+                    "job_role": "software-engineer", "location": "usa", "headcount": headcount, "constraint": "balanced"})
+                (optimize if status == 200 else errors).append(seconds)
+            except OSError:
+                errors.append(None)
+
+    def prober():
+        while time.perf_counter() < stop_at:
+            try:
+                status, seconds = request(port, "GET", "/api/locations", timeout=30.0)
+                (probes if status == 200 else errors).append(seconds)
+            except OSError:
+                errors.append(None)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=optimizer) for _ in range(concurrency)] + [threading.Thread(target=prober)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "optimize": dict(summarize(optimize), throughput_per_s=len(optimize) / elapsed),
+        "locations": summarize(probes),
+        "errors": len(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OptiForce sync vs async serving")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=sorted(SERVER_COMMANDS))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--generation-ms", type=float, default=1000.0)
+    parser.add_argument("--port", type=int, default=8093)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="optiforce-bench-"), "llm.sock")
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "inference_server.py"), "--stub",
+                             "--stub-delay-ms", str(args.generation_ms), "--bind", f"unix:{socket_path}"],
+                            stdout=subprocess.DEVNULL)
+    env = dict(os.environ, OPTIFORCE_INFERENCE_URL=f"unix:{socket_path}", OPTIFORCE_EXPLANATION_CACHE_DB="",
+               OPTIFORCE_SINGLEFLIGHT_DIR="", OPTIFORCE_OPTIMIZE_BUDGET_MS="60000")
+
+    results = []
+    try:
+        for mode in args.modes:
+            server = subprocess.Popen(SERVER_COMMANDS[mode](args.port, args.workers), cwd=ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+            try:
+                wait_until_up(args.port, time.time() + 60)
+                result = dict(mode=mode, workers=args.workers, concurrency=args.concurrency,
+                              generation_ms=args.generation_ms, **run_load(args.port, args.concurrency, args.duration))
+            finally:
+                os.killpg(server.pid, signal.SIGTERM)
+                server.wait()
+            results.append(result)
+            print(f"{mode:>6}: optimize {result['optimize']['throughput_per_s']:6.2f}/s "
+                  f"p50 {result['optimize']['p50_ms']:8.0f} ms | /api/locations p50 {result['locations']['p50_ms']:8.1f} ms "
+                  f"p99 {result['locations']['p99_ms']:8.1f} ms ({result['locations']['requests']} probes, {result['errors']} errors)")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
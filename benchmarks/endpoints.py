@@ -0,0 +1,130 @@
+"""End-to-end load test of /api/optimize, in-process and through a local gunicorn.
+
+The in-process run drives the Flask test client serially, which isolates the
+app's own per-request cost (parsing, solving, pricing, JSON) from the network and
+the WSGI server. The gunicorn run keeps --concurrency clients busy against real
+worker processes for --duration seconds. The model is off by default, so both
+measure the deterministic path with the template explanation. Pass --model tiny
+(or a model id) to include generation:
+
+    python benchmarks/endpoints.py --requests 2000 --workers 2 --concurrency 8 --output endpoints.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from concurrency import percentile, request, summarize, wait_until_up
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLES = ("software-engineer", "data-scientist", "product-manager", "hr-manager")
+LOCATIONS = ("usa", "germany", "india", "portugal")
+HEADCOUNTS = (1, 5, 25, 120, 800)
+CONSTRAINTS = ("cost-focused", "balanced", "quality-focused")
+
+
+def payloads():
+    """A repeating mix of optimize inputs, so the allocation cache warms up the way it does in production"""
+    for role, location, headcount, constraint in itertools.cycle(itertools.product(ROLES, LOCATIONS, HEADCOUNTS, CONSTRAINTS)):
+        yield {"job_role": role, "location": location, "headcount": headcount, "constraint": constraint}
+
+
+def run_test_client(requests: int) -> dict:
+    sys.path.insert(0, ROOT)
+    import optiforce_app
+
+    if optiforce_app.model_manager.load_mode != "off":
+        optiforce_app.model_manager.wait()
+    client = optiforce_app.app.test_client()
+    inputs = payloads()
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        sent = time.perf_counter()
+        response = client.post("/api/optimize", json=next(inputs))
+        latencies.append(time.perf_counter() - sent)
+        errors += response.status_code != 200
+    elapsed = time.perf_counter() - started
+    return dict(summarize(latencies), throughput_per_s=requests / elapsed, errors=errors,
+                mean_ms=sum(latencies) / len(latencies) * 1000.0)
+
+
+def run_gunicorn(port: int, workers: int, concurrency: int, duration: float, env: dict) -> dict:
+    server = subprocess.Popen(["gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--timeout", "120",
+                               "optiforce_app:app"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        wait_until_up(port, time.time() + 120)
+        while env["OPTIFORCE_MODEL_LOAD"] != "off" and request(port, "GET", "/readyz")[0] != 200:
+            time.sleep(0.5)  # let the model finish loading so every request includes generation
+        inputs, lock = payloads(), threading.Lock()
+        latencies, errors = [], []
+        stop_at = time.perf_counter() + duration
+
+        def client():
+            while time.perf_counter() < stop_at:
+                with lock:
+                    body = next(inputs)
+                try:
+                    status, seconds = request(port, "POST", "/api/optimize", body)
+                    (latencies if status == 200 else errors).append(seconds)
+                except OSError:
+                    errors.append(None)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+    return dict(summarize(latencies), throughput_per_s=len(latencies) / elapsed, errors=len(errors),
+                workers=workers, concurrency=concurrency, p999_ms=percentile(latencies, 0.999) * 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test OptiForce's /api/optimize")
+    parser.add_argument("--modes", nargs="+", default=["test-client", "gunicorn"], choices=["test-client", "gunicorn"])
+    parser.add_argument("--requests", type=int, default=2000, help="requests for the in-process run")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8094)
+    parser.add_argument("--model", help='load this model (or "tiny") so responses include generation')
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    # Each run measures fresh work: no shared result files or disk caches carried over between runs
+    env = {"OPTIFORCE_MODEL_LOAD": "off", "OPTIFORCE_EXPLANATION_CACHE_DB": "", "OPTIFORCE_SINGLEFLIGHT_DIR": ""}
+    if args.model:
+        from tiny_model import resolve
+        env.update(OPTIFORCE_MODEL_LOAD="background", OPTIFORCE_MODEL_ID=resolve(args.model))
+    os.environ.update(env)
+    os.environ.pop("OPTIFORCE_INFERENCE_URL", None)
+
+    results = {}
+    if "test-client" in args.modes:
+        results["test_client"] = dict(run_test_client(args.requests), requests=args.requests)
+    if "gunicorn" in args.modes:
+        results["gunicorn"] = run_gunicorn(args.port, args.workers, args.concurrency, args.duration, dict(os.environ))
+    for mode, result in results.items():
+        print(f"{mode:>12}: {result['throughput_per_s']:8.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+              f"p99 {result['p99_ms']:7.2f} ms  ({result['requests']} requests, {result['errors']} errors)")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Microbenchmarks for the data and optimization layers.
+
+Times DataIngestionService.get_salary_data, OptimizationEngine.calculate_fte_cost /
+calculate_contractor_cost and generate_scenarios for a spread of headcounts. Scenario
+generation is timed warm (allocation cache primed, the steady state of a busy worker)
+and cold (cache cleared before every call, so the solver runs each time):
+
+    python benchmarks/engine.py --headcounts 1 10 100 1000 10000 --output engine.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_call(fn, repeat: int) -> dict:
+    """Per-call microseconds over ``repeat`` rounds, each long enough to time reliably"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    rounds = [seconds / number * 1e6 for seconds in timer.repeat(repeat=repeat, number=number)]
+    return {"calls_per_round": number, "best_us": min(rounds), "median_us": statistics.median(rounds)}
+
+
+def run(headcounts, repeat: int) -> list:
+    os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+    sys.path.insert(0, ROOT)
+    import optiforce_app
+
+    data = optiforce_app.data_service
+    engine = optiforce_app.optimization_engine
+    role, location = "software-engineer", "usa"
+
+    results = [
+        dict(name="get_salary_data", **time_call(lambda: data.get_salary_data(role, location), repeat)),
+        dict(name="calculate_fte_cost", **time_call(lambda: engine.calculate_fte_cost(role, location, 25), repeat)),
+        dict(name="calculate_contractor_cost", **time_call(lambda: engine.calculate_contractor_cost(role, location, 25), repeat))
+    ]
+    for headcount in headcounts:
+        for constraint in ("cost-focused", "balanced"):
+            def scenarios():
+                return engine.generate_scenarios(role, location, headcount, constraint, "both")
+
+            def cold_scenarios():
+                engine._allocation_cache.clear()
+                return scenarios()
+
+            scenarios()
+            results.append(dict(name="generate_scenarios", headcount=headcount, constraint=constraint, cache="warm",
+                                **time_call(scenarios, repeat)))
+            results.append(dict(name="generate_scenarios", headcount=headcount, constraint=constraint, cache="cold",
+                                **time_call(cold_scenarios, repeat)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark the OptiForce data and optimization layers")
+    parser.add_argument("--headcounts", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.headcounts, args.repeat)
+    for result in results:
+        label = result["name"]
+        if "headcount" in result:
+            label += f" h={result['headcount']} {result['constraint']} {result['cache']}"
+        print(f"{label:<52} {result['best_us']:12.2f} us best  {result['median_us']:12.2f} us median")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark the explanation model: load time, prefill, decode tokens/sec and batched throughput.
+
+Prefill is one forward pass over a full explanation prompt; decode speed is the
+marginal cost of each generated token past the first. Batched throughput runs the
+micro-batcher's generate_batch with several distinct prompts at once. --model tiny
+uses the offline stand-in from tiny_model.py, so the suite runs without network access:
+
+    python benchmarks/llm.py --model tiny --output llm.json
+    python benchmarks/llm.py --model microsoft/Phi-3-mini-4k-instruct --backend torch-int8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def best_seconds(fn, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(model_id: str, backend: str, new_tokens: int, batch_sizes, runs: int) -> dict:
+    os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+    os.environ.pop("OPTIFORCE_INFERENCE_URL", None)
+    sys.path.insert(0, ROOT)
+    import optiforce_app
+    import torch
+
+    manager = optiforce_app.ModelManager(model_id=model_id, load_mode="lazy", backend=backend)
+    manager.start()
+    if not manager.wait():
+        raise SystemExit(f"model failed to load: {manager.error}")
+    service = optiforce_app.LightweightLLMService(manager)
+    service.batcher.deterministic = True
+    tokenizer, model = manager.tokenizer, manager.model
+
+    engine = optiforce_app.optimization_engine
+    prompts = []
+    for job in optiforce_app.data_service.job_roles:
+        location = optiforce_app.data_service.locations[len(prompts) % len(optiforce_app.data_service.locations)]["id"]
+        scenarios = engine.generate_scenarios(job["id"], location, 10 + 7 * len(prompts), "balanced", "both")
+        prompts.append(service.build_prompt(scenarios, job["id"]))
+
+    inputs = tokenizer(prompts[0], return_tensors="pt").to(model.device)
+    result = {"model_id": model_id, "backend": backend, "load_seconds": manager.load_seconds,
+              "prompt_tokens": int(inputs["input_ids"].shape[1]), "new_tokens": new_tokens}
+
+    def prefill():
+        with torch.no_grad():
+            model(**inputs, use_cache=True)
+
+    def generate(count):
+        return lambda: model.generate(**inputs, max_new_tokens=count, min_new_tokens=count, do_sample=False,
+                                      pad_token_id=tokenizer.pad_token_id)
+
+    prefill()  # warm-up
+    result["prefill_ms"] = best_seconds(prefill, runs) * 1000.0
+    first = best_seconds(generate(1), runs)
+    full = best_seconds(generate(new_tokens), runs)
+    result["first_token_ms"] = first * 1000.0
+    result["decode_tokens_per_second"] = (new_tokens - 1) / (full - first) if full > first else None
+    result["tokens_per_second"] = new_tokens / full
+
+    result["batched"] = []
+    for size in batch_sizes:
+        batch = (prompts * (size // len(prompts) + 1))[:size]
+        seconds = best_seconds(lambda: service.batcher.generate_batch(batch, [new_tokens] * size), runs)
+        result["batched"].append({"batch_size": size, "seconds": seconds, "tokens_per_second": size * new_tokens / seconds})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OptiForce explanation model")
+    parser.add_argument("--model", default=os.environ.get("OPTIFORCE_MODEL_ID", "microsoft/Phi-3-mini-4k-instruct"),
+                        help='model id or path, or "tiny" for the offline stand-in')
+    parser.add_argument("--backend", default=os.environ.get("OPTIFORCE_INFERENCE_BACKEND", "torch"))
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    from tiny_model import resolve
+
+    result = run(resolve(args.model), args.backend, args.new_tokens, args.batch_sizes, args.runs)
+    decode = f"{result['decode_tokens_per_second']:.1f} tok/s" if result["decode_tokens_per_second"] else "n/a"
+    print(f"load {result['load_seconds']:.1f}s  prefill {result['prefill_ms']:.1f} ms ({result['prompt_tokens']} tokens)  "
+          f"first token {result['first_token_ms']:.1f} ms  decode {decode}")
+    for batched in result["batched"]:
+        print(f"  batch {batched['batch_size']:>3}: {batched['tokens_per_second']:8.1f} tok/s")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Check and time the prompt-prefix KV cache.
+
+Generates explanations for a spread of scenarios with greedy decoding, once
+through the ordinary path and once starting from the cached prefix, one prompt
+at a time and as one padded batch. Exits non-zero if any output differs, then
+reports the time to first token with and without the cache:
+
+    python benchmarks/prefix_cache.py --model microsoft/Phi-3-mini-4k-instruct --output prefix_cache.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and benchmark the prompt-prefix KV cache")
+    parser.add_argument("--model", default=os.environ.get("OPTIFORCE_MODEL_ID", "microsoft/Phi-3-mini-4k-instruct"))
+    parser.add_argument("--backend", default=os.environ.get("OPTIFORCE_INFERENCE_BACKEND", "torch"))
+    parser.add_argument("--new-tokens", type=int, default=48)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+    os.environ.pop("OPTIFORCE_INFERENCE_URL", None)
+    sys.path.insert(0, ROOT)
+    import optiforce_app
+
+    manager = optiforce_app.ModelManager(model_id=args.model, load_mode="lazy", backend=args.backend)
+    manager.start()
+    if not manager.wait():
+        sys.exit(f"model failed to load: {manager.error}")
+    service = optiforce_app.LightweightLLMService(manager)
+    service.batcher.deterministic = True
+    engine = optiforce_app.optimization_engine
+
+    prompts = []
+    for job_role, location, headcount in [("software-engineer", "usa", 25), ("data-scientist", "germany", 7),
+                                          ("hr-manager", "india", 130), ("product-manager", "portugal", 1)]:
+        scenarios = engine.generate_scenarios(job_role, location, headcount, "balanced", "both")
+        prompts.append(service.build_prompt(scenarios, job_role))
+    limits = [args.new_tokens] * len(prompts)
+
+    def generate(prompts, cached):
+        service.prefix_cache.enabled = cached
+        return service.batcher.generate_batch(prompts, limits[:len(prompts)])
+
+    mismatches = []
+    for prompt in prompts:
+        if generate([prompt], False) != generate([prompt], True):
+            mismatches.append(("single", prompt))
+    if generate(prompts, False) != generate(prompts, True):
+        mismatches.append(("batch", None))
+
+    def first_token_seconds(cached):
+        service.prefix_cache.enabled = cached
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            service.batcher.generate_batch(prompts[:1], [1])
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    first_token_seconds(True)  # prefill the prefix once, outside the timings
+    uncached, cached = first_token_seconds(False), first_token_seconds(True)
+    result = {
+        "model_id": args.model,
+        "backend": args.backend,
+        "identical": not mismatches,
+        "prefix_tokens": service.prefix_cache.stats()["prefix_tokens"],
+        "prompt_tokens": len(manager.tokenizer(prompts[0])["input_ids"]),
+        "first_token_ms_uncached": uncached * 1000.0,
+        "first_token_ms_cached": cached * 1000.0,
+        "speedup": uncached / cached
+    }
+    print(f"outputs identical: {result['identical']}  prefix {result['prefix_tokens']}/{result['prompt_tokens']} tokens  "
+          f"first token {result['first_token_ms_uncached']:.1f} ms -> {result['first_token_ms_cached']:.1f} ms "
+          f"({result['speedup']:.2f}x)")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+    if mismatches:
+        for kind, prompt in mismatches:
+            print(f"MISMATCH ({kind}): {prompt!r}" if prompt else f"MISMATCH ({kind})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
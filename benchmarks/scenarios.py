@@ -0,0 +1,104 @@
+"""Microbenchmark the scenario representation: array-backed ScenarioSet against per-line dicts.
+
+"dicts" rebuilds scenarios the way the engine used to: one dict per allocation line,
+priced cell by cell from the cost matrix. "records" builds a ScenarioSet and stops
+there, which is all a caller that only needs totals, savings or counts pays. "records +
+to_dict" adds the JSON conversion a response does at the edge. Memory is what holding
+--lines results alive costs, measured with tracemalloc:
+
+    python benchmarks/scenarios.py --lines 10000 --output scenarios.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+from engine import time_call
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def dict_scenarios(engine, job_role, location, headcount, constraint, employment_type) -> dict:
+    """The previous per-line dict builder, kept here as the baseline"""
+    data = engine.data_service
+    i, primary = data.cost_indices(job_role, location)
+    limits, balanced_limits = engine.scenario_limits(constraint, employment_type)
+    counts = engine.scenario_counts(primary, headcount, limits, balanced_limits, employment_type)
+    unit_costs = data.unit_cost_matrix[i]
+    scenarios = {}
+    for k, (key, name, description) in enumerate(engine.SCENARIOS):
+        allocation, total_cost = [], 0
+        for j, t, count in engine._allocation_lines(counts[k], unit_costs):
+            unit_cost = float(data.unit_cost_matrix[i, j, t])
+            allocation.append({"location": data.locations[j]["name"], "type": "FTE" if t == 0 else "Contractor",
+                               "count": count, "unit_cost": unit_cost, "total_cost": unit_cost * count})
+            total_cost += unit_cost * count
+        scenarios[key] = {"name": name, "allocation": allocation, "total_cost": total_cost,
+                          "avg_cost_per_employee": total_cost / headcount, "description": description}
+    return scenarios
+
+
+def retained_bytes(build, lines: int) -> int:
+    """Bytes still allocated after building and holding one result per line"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(n) for n in range(lines)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+
+def run(headcount: int, lines: int, repeat: int) -> list:
+    os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+    sys.path.insert(0, ROOT)
+    import optiforce_app
+
+    engine = optiforce_app.optimization_engine
+    roles = [job["id"] for job in optiforce_app.data_service.job_roles]
+    locations = [loc["id"] for loc in optiforce_app.data_service.locations]
+    inputs = ("software-engineer", "usa", headcount, "balanced", "both")
+    engine.scenario_set(*inputs)  # prime the allocation cache; only the representation is timed
+
+    def line_inputs(n):
+        return roles[n % len(roles)], locations[n // len(roles) % len(locations)], headcount, "balanced", "both"
+
+    variants = {
+        "dicts": (lambda: dict_scenarios(engine, *inputs), lambda n: dict_scenarios(engine, *line_inputs(n))),
+        "records": (lambda: engine.scenario_set(*inputs), lambda n: engine.scenario_set(*line_inputs(n))),
+        "records + to_dict": (lambda: engine.scenario_set(*inputs).to_dict(), None)
+    }
+    results = []
+    for name, (single, per_line) in variants.items():
+        result = dict(name=name, headcount=headcount, **time_call(single, repeat))
+        if per_line is not None:
+            for n in range(len(roles) * len(locations)):
+                per_line(n)  # warm every line's cache entry before measuring what the results hold
+            result["lines"] = lines
+            result["retained_bytes_per_line"] = retained_bytes(per_line, lines) / lines
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark OptiForce's scenario representation")
+    parser.add_argument("--headcount", type=int, default=25)
+    parser.add_argument("--lines", type=int, default=10000, help="results held alive for the memory measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.headcount, args.lines, args.repeat)
+    for result in results:
+        memory = f"{result['retained_bytes_per_line']:10.0f} B/line held" if "retained_bytes_per_line" in result else ""
+        print(f"{result['name']:<20} {result['best_us']:10.2f} us best  {result['median_us']:10.2f} us median  {memory}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Run the benchmark suite and record one JSON report per run, to compare across releases.
+
+Layers, each in its own process so imports, caches and models don't leak between them:
+
+    engine     benchmarks/engine.py     data and optimization microbenchmarks
+    scenarios  benchmarks/scenarios.py  scenario records vs dicts: build time and memory held per result
+    llm        benchmarks/llm.py        model load, prefill, decode and batched tokens/sec
+    endpoints  benchmarks/endpoints.py  /api/optimize through the test client and gunicorn
+
+The LLM layer uses the offline stand-in model unless --model says otherwise. The report
+records the git commit and library versions alongside the numbers. With --baseline, every
+metric that got worse by more than --tolerance is listed and the exit status is 1:
+
+    python benchmarks/suite.py --output bench-1.4.json
+    python benchmarks/suite.py --baseline bench-1.4.json --output bench-1.5.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+LAYERS = ("engine", "scenarios", "llm", "endpoints")
+
+
+def environment() -> dict:
+    def version(module):
+        try:
+            return __import__(module).__version__
+        except ImportError:
+            return None
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": version("numpy"),
+        "flask": version("flask"),
+        "torch": version("torch"),
+        "transformers": version("transformers")
+    }
+
+
+def run_layer(layer: str, arguments, workdir: str) -> dict:
+    output = os.path.join(workdir, f"{layer}.json")
+    command = [sys.executable, os.path.join(BENCHMARKS, f"{layer}.py"), *arguments, "--output", output]
+    completed = subprocess.run(command, cwd=ROOT)
+    if completed.returncode != 0 or not os.path.exists(output):
+        return {"error": f"{layer} benchmark exited with status {completed.returncode}"}
+    with open(output) as results:
+        return json.load(results)
+
+
+def metrics(report: dict) -> dict:
+    """Flat {name: (value, better)} view of a report, where better is "lower" or "higher" """
+    flat = {}
+    for result in report.get("engine") or []:
+        if isinstance(result, dict) and "best_us" in result:
+            name = "/".join(str(result[key]) for key in ("name", "headcount", "constraint", "cache") if key in result)
+            flat[f"engine/{name}/best_us"] = (result["best_us"], "lower")
+    for result in report.get("scenarios") or []:
+        if isinstance(result, dict) and "best_us" in result:
+            flat[f"scenarios/{result['name']}/best_us"] = (result["best_us"], "lower")
+            if "retained_bytes_per_line" in result:
+                flat[f"scenarios/{result['name']}/retained_bytes_per_line"] = (result["retained_bytes_per_line"], "lower")
+    llm = report.get("llm") or {}
+    for key in ("prefill_ms", "first_token_ms"):
+        if llm.get(key) is not None:
+            flat[f"llm/{key}"] = (llm[key], "lower")
+    if llm.get("decode_tokens_per_second"):
+        flat["llm/decode_tokens_per_second"] = (llm["decode_tokens_per_second"], "higher")
+    for batched in llm.get("batched", []):
+        flat[f"llm/batch_{batched['batch_size']}/tokens_per_second"] = (batched["tokens_per_second"], "higher")
+    for mode, result in (report.get("endpoints") or {}).items():
+        if isinstance(result, dict) and "p50_ms" in result:
+            flat[f"endpoints/{mode}/p50_ms"] = (result["p50_ms"], "lower")
+            flat[f"endpoints/{mode}/p99_ms"] = (result["p99_ms"], "lower")
+            flat[f"endpoints/{mode}/throughput_per_s"] = (result["throughput_per_s"], "higher")
+    return flat
+
+
+def regressions(baseline: dict, report: dict, tolerance: float) -> list:
+    """(metric, before, after, change) for every metric that got worse by more than tolerance"""
+    before, after = metrics(baseline), metrics(report)
+    found = []
+    for name, (value, better) in sorted(after.items()):
+        if name not in before or not before[name][0]:
+            continue
+        change = value / before[name][0] - 1.0
+        if (change > tolerance) if better == "lower" else (change < -tolerance):
+            found.append((name, before[name][0], value, change))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the OptiForce benchmark suite")
+    parser.add_argument("--layers", nargs="+", default=list(LAYERS), choices=LAYERS)
+    parser.add_argument("--model", default="tiny", help='explanation model for the LLM layer (default "tiny", offline)')
+    parser.add_argument("--quick", action="store_true", help="fewer repeats and shorter load runs, for CI smoke checks")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a metric counts as a regression")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    layer_arguments = {
+        "engine": ["--repeat", "3" if args.quick else "5"],
+        "scenarios": ["--repeat", "3" if args.quick else "5", "--lines", "2000" if args.quick else "10000"],
+        "llm": ["--model", args.model, "--runs", "2" if args.quick else "3"],
+        "endpoints": ["--requests", "500" if args.quick else "2000", "--duration", "3" if args.quick else "10"]
+    }
+    report = {"environment": environment()}
+    with tempfile.TemporaryDirectory(prefix="optiforce-bench-") as workdir:
+        for layer in args.layers:
+            print(f"== {layer}")
+            report[layer] = run_layer(layer, layer_arguments[layer], workdir)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    failed = [layer for layer in args.layers if isinstance(report[layer], dict) and "error" in report[layer]]
+    for layer in failed:
+        print(f"{layer}: {report[layer]['error']}")
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            found = regressions(json.load(baseline), report, args.tolerance)
+        for name, before, after, change in found:
+            print(f"REGRESSION {name}: {before:.4g} -> {after:.4g} ({change:+.0%})")
+        print(f"{len(found)} regression(s) beyond {args.tolerance:.0%} against {args.baseline}")
+        failed += found
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Build a tiny, randomly initialised stand-in for the explanation model.
+
+A 2-layer GPT-2 with a byte-level BPE tokenizer trained on OptiForce's own prompts,
+so the LLM benchmarks (and a local dev server) run offline in seconds. Its output
+is noise; only the timings mean anything, and only relative to each other:
+
+    python benchmarks/tiny_model.py /tmp/optiforce-tiny-model
+    OPTIFORCE_MODEL_ID=/tmp/optiforce-tiny-model python optiforce_app.py
+
+The LLM benchmarks accept --model tiny and build it into DEFAULT_PATH on first use.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "optiforce-tiny-model")
+
+
+def corpus() -> list:
+    """Prompts of the kinds the app sends, across roles, locations and headcounts"""
+    os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+    sys.path.insert(0, ROOT)
+    import optiforce_app
+
+    engine, service = optiforce_app.optimization_engine, optiforce_app.llm_service
+    texts = []
+    for job in optiforce_app.data_service.job_roles:
+        for location in optiforce_app.data_service.locations:
+            for headcount in (1, 25, 400):
+                scenarios = engine.generate_scenarios(job["id"], location["id"], headcount, "balanced", "both")
+                texts.append(service.build_prompt(scenarios, job["id"]))
+                texts.append(service.fallback_explanation(scenarios, job["id"]))
+    unit_costs = optiforce_app.data_service.unit_cost_matrix[0]
+    texts += [optiforce_app.comparison_index.pair_prompt(j, k, unit_costs)
+              for j in range(len(unit_costs)) for k in range(len(unit_costs)) if j != k]
+    return texts
+
+
+def build(path: str = DEFAULT_PATH, vocab_size: int = 1024, layers: int = 2, hidden: int = 64, seed: int = 0) -> str:
+    """Write the tokenizer and model to path (reusing what is already there) and return path"""
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(corpus(), trainers.BpeTrainer(
+        vocab_size=vocab_size, special_tokens=["<unk>", "<|endoftext|>"], initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>", eos_token="<|endoftext|>",
+                                   bos_token="<|endoftext|>", model_input_names=["input_ids", "attention_mask"])
+
+    torch.manual_seed(seed)
+    eos = fast.convert_tokens_to_ids("<|endoftext|>")
+    model = GPT2LMHeadModel(GPT2Config(vocab_size=len(fast), n_positions=2048, n_embd=hidden, n_layer=layers, n_head=2,
+                                       bos_token_id=eos, eos_token_id=eos))
+    fast.save_pretrained(path)
+    model.save_pretrained(path)
+    return path
+
+
+def resolve(model_id: str) -> str:
+    """Model id as given, with "tiny" standing for the stand-in model (built on first use)"""
+    return build() if model_id == "tiny" else model_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a tiny offline stand-in for the explanation model")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--vocab-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--hidden", type=int, default=64)
+    args = parser.parse_args()
+    print(build(args.path, args.vocab_size, args.layers, args.hidden))
+
+
+if __name__ == "__main__":
+    main()
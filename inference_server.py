@@ -0,0 +1,132 @@
+"""OptiForce inference server: owns the single shared copy of the explanation model.
+
+Run one of these per box and point every gunicorn worker at it with
+OPTIFORCE_INFERENCE_URL, so workers scale with cores without each loading
+its own model weights:
+
+    python inference_server.py --bind unix:/tmp/optiforce-llm.sock
+    OPTIFORCE_INFERENCE_URL=unix:/tmp/optiforce-llm.sock gunicorn -w 8 optiforce_app:app
+
+``--stub`` answers with deterministic canned text and never loads a model,
+which is handy for tests and local frontend work.
+"""
+
+import argparse
+import json
+import os
+import socket
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+
+class StubGenerator:
+    """Stands in for the model: deterministic output, instant unless given a delay to emulate generation time"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def generate_text(self, prompt: str, max_new_tokens: int = 200) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        words = prompt.split()
+        return "Stub explanation: " + " ".join(words[-min(len(words), max_new_tokens):])
+
+    def status(self) -> Dict[str, Any]:
+        return {"model_id": "stub", "state": "ready", "ready": True}
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP: POST /generate, GET /readyz"""
+
+    generator = None
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/readyz":
+            status = self.generator.status()
+            self._send(200 if status.get("ready") else 503, status)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}")
+            text = self.generator.generate_text(data["prompt"], int(data.get("max_new_tokens", 200)))
+        except (KeyError, ValueError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        if text is None:
+            self._send(503, {"error": "model not ready"})
+        else:
+            self._send(200, {"text": text})
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) pair
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if os.environ.get("OPTIFORCE_INFERENCE_LOG"):
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        self.socket.bind(self.server_address)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def make_server(bind: str, generator) -> ThreadingHTTPServer:
+    """Build a server for ``host:port`` or ``unix:/path`` serving ``generator``"""
+    handler = type("BoundInferenceRequestHandler", (InferenceRequestHandler,), {"generator": generator})
+    if bind.startswith("unix:"):
+        return UnixHTTPServer(bind[len("unix:"):], handler)
+    host, _, port = bind.rpartition(":")
+    return ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bind", default=os.environ.get("OPTIFORCE_INFERENCE_BIND", "127.0.0.1:8091"),
+                        help="host:port or unix:/path/to/socket")
+    parser.add_argument("--stub", action="store_true", help="serve canned text instead of loading a model")
+    parser.add_argument("--stub-delay-ms", type=float, default=0.0, help="with --stub, take this long per generation")
+    args = parser.parse_args()
+
+    if args.stub:
+        generator = StubGenerator(args.stub_delay_ms / 1000.0)
+    else:
+        # This process is the model owner, so it must never forward to itself
+        os.environ.pop("OPTIFORCE_INFERENCE_URL", None)
+        import optiforce_app
+        generator = optiforce_app.llm_service
+        generator.model_manager.start()
+
+    server = make_server(args.bind, generator)
+    print(f"OptiForce inference server listening on {args.bind}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,75 @@
 
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 import json
+import csv
+import io
 import random
 import time
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 import math
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
+import mmap
 import os
-
+import numpy as np
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import queue
+import socket
+import sys
+import hashlib
+import uuid
+import sqlite3
+import tempfile
+from collections import OrderedDict
+import http.client
+import urllib.parse
+import gzip
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import parse_etags
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding with orjson when it is installed
+
+    orjson writes the same JSON as the stdlib here (sorted keys, shortest float repr)
+    several times faster, and encodes numpy arrays directly. NaN and infinity become
+    null rather than the stdlib's non-standard NaN.
+    """
+
+    OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode()
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        if orjson is None:
+            return super().dumps(obj).encode()
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)  # debug mode pretty-prints
+        body = self.dumps_bytes(self._prepare_response_obj(args, kwargs))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # ============================================================================
 # PHASE 1: DATA INGESTION SERVICE
@@ -21,7 +78,7 @@ app = Flask(__name__)
 class DataIngestionService:
     """Phase 1: Handles real-time salary, benefits, and geographic cost data"""
 
-    def __init__(self):
+    def __init__(self, data_dir: Optional[str] = None):
         self.job_roles = [
             {"id": "software-engineer", "name": "Software Engineer", "baseMultiplier": 1.0},
             {"id": "data-scientist", "name": "Data Scientist", "baseMultiplier": 1.2},
@@ -34,14 +91,14 @@ class DataIngestionService:
         ]
 
         self.locations = [
-            {"id": "usa", "name": "USA", "costIndex": 1.0, "socialCharges": 0.12, "benefits": 0.25, "contractorPremium": 2.0},
-            {"id": "germany", "name": "Germany", "costIndex": 0.85, "socialCharges": 0.45, "benefits": 0.22, "contractorPremium": 1.8},
-            {"id": "india", "name": "India", "costIndex": 0.25, "socialCharges": 0.12, "benefits": 0.08, "contractorPremium": 1.2},
-            {"id": "portugal", "name": "Portugal", "costIndex": 0.55, "socialCharges": 0.23, "benefits": 0.15, "contractorPremium": 1.5},
-            {"id": "poland", "name": "Poland", "costIndex": 0.45, "socialCharges": 0.35, "benefits": 0.18, "contractorPremium": 1.4},
-            {"id": "ukraine", "name": "Ukraine", "costIndex": 0.30, "socialCharges": 0.22, "benefits": 0.12, "contractorPremium": 1.3},
-            {"id": "philippines", "name": "Philippines", "costIndex": 0.20, "socialCharges": 0.15, "benefits": 0.10, "contractorPremium": 1.2},
-            {"id": "mexico", "name": "Mexico", "costIndex": 0.35, "socialCharges": 0.28, "benefits": 0.16, "contractorPremium": 1.4}
+            {"id": "usa", "name": "USA", "costIndex": 1.0, "socialCharges": 0.12, "benefits": 0.25, "contractorPremium": 2.0, "timezoneGroup": "americas"},
+            {"id": "germany", "name": "Germany", "costIndex": 0.85, "socialCharges": 0.45, "benefits": 0.22, "contractorPremium": 1.8, "timezoneGroup": "europe"},
+            {"id": "india", "name": "India", "costIndex": 0.25, "socialCharges": 0.12, "benefits": 0.08, "contractorPremium": 1.2, "timezoneGroup": "apac"},
+            {"id": "portugal", "name": "Portugal", "costIndex": 0.55, "socialCharges": 0.23, "benefits": 0.15, "contractorPremium": 1.5, "timezoneGroup": "europe"},
+            {"id": "poland", "name": "Poland", "costIndex": 0.45, "socialCharges": 0.35, "benefits": 0.18, "contractorPremium": 1.4, "timezoneGroup": "europe"},
+            {"id": "ukraine", "name": "Ukraine", "costIndex": 0.30, "socialCharges": 0.22, "benefits": 0.12, "contractorPremium": 1.3, "timezoneGroup": "europe"},
+            {"id": "philippines", "name": "Philippines", "costIndex": 0.20, "socialCharges": 0.15, "benefits": 0.10, "contractorPremium": 1.2, "timezoneGroup": "apac"},
+            {"id": "mexico", "name": "Mexico", "costIndex": 0.35, "socialCharges": 0.28, "benefits": 0.16, "contractorPremium": 1.4, "timezoneGroup": "americas"}
         ]
 
         self.base_salaries = {
@@ -55,25 +112,268 @@ class DataIngestionService:
             "hr-manager": 80000
         }
 
-        
-
+        # Annual cost-risk assumptions per location: FX volatility against USD, wage
+        # inflation (mean and spread) and attrition rate (mean and spread)
+        self.risk_factors = {
+            "usa": {"fxVolatility": 0.0, "wageInflation": 0.035, "wageInflationVolatility": 0.01, "attrition": 0.13, "attritionVolatility": 0.03},
+            "germany": {"fxVolatility": 0.07, "wageInflation": 0.03, "wageInflationVolatility": 0.01, "attrition": 0.10, "attritionVolatility": 0.02},
+            "india": {"fxVolatility": 0.06, "wageInflation": 0.09, "wageInflationVolatility": 0.02, "attrition": 0.18, "attritionVolatility": 0.04},
+            "portugal": {"fxVolatility": 0.07, "wageInflation": 0.035, "wageInflationVolatility": 0.01, "attrition": 0.12, "attritionVolatility": 0.03},
+            "poland": {"fxVolatility": 0.09, "wageInflation": 0.06, "wageInflationVolatility": 0.02, "attrition": 0.13, "attritionVolatility": 0.03},
+            "ukraine": {"fxVolatility": 0.15, "wageInflation": 0.10, "wageInflationVolatility": 0.04, "attrition": 0.15, "attritionVolatility": 0.05},
+            "philippines": {"fxVolatility": 0.06, "wageInflation": 0.05, "wageInflationVolatility": 0.015, "attrition": 0.20, "attritionVolatility": 0.05},
+            "mexico": {"fxVolatility": 0.12, "wageInflation": 0.05, "wageInflationVolatility": 0.015, "attrition": 0.16, "attritionVolatility": 0.04}
+        }
 
+        self.data_version = "builtin"
+        self.data_dir = data_dir
+        self.poll_interval = float(os.environ.get("OPTIFORCE_DATA_POLL_SECONDS", 2.0))
+        self._next_poll = 0.0
+        self._reload_lock = threading.Lock()
+        self.build_cost_matrix()
+        if data_dir:
+            self.reload()
+
+    # Axes of the dense cost matrix: role x location x employment type x cost component
+    EMPLOYMENT_TYPES = ("fte", "contractor")
+    TIMEZONE_GROUPS = ("americas", "europe", "apac")
+    COST_COMPONENTS = ("base_salary", "social_charges", "benefits")
+    CONTRACTOR_SOCIAL_CHARGES = 0.05  # Contractors carry minimal social charges and no benefits
+
+    def build_cost_matrix(self) -> None:
+        """Index roles/locations and precompute every per-employee cost component"""
+        self.role_index = {job["id"]: i for i, job in enumerate(self.job_roles)}
+        self.location_index = {loc["id"]: j for j, loc in enumerate(self.locations)}
+        self.cost_matrix = np.zeros((len(self.job_roles), len(self.locations), len(self.EMPLOYMENT_TYPES), len(self.COST_COMPONENTS)))
+        self.unit_cost_matrix = np.zeros(self.cost_matrix.shape[:3])
+        self._fill_costs(range(len(self.job_roles)), range(len(self.locations)))
+
+    def _fill_costs(self, roles, locations) -> None:
+        """Recompute the (roles x locations) block of the cost matrix in one vectorized pass"""
+        roles, locations = list(roles), list(locations)
+        block = self._cost_block([self.job_roles[i] for i in roles], [self.locations[j] for j in locations], self.base_salaries)
+
+        if not self.cost_matrix.flags.writeable:
+            # A local rate edit moves this worker off the shared snapshot onto a private copy
+            self.cost_matrix, self.unit_cost_matrix = self.cost_matrix.copy(), self.unit_cost_matrix.copy()
+        cells = np.ix_(roles, locations)
+        self.cost_matrix[cells] = block
+        self.unit_cost_matrix[cells] = block[..., 0] + block[..., 1] + block[..., 2]
+        self.revision = getattr(self, "revision", 0) + 1
+
+    @classmethod
+    def _cost_block(cls, job_roles: List[Dict[str, Any]], locations: List[Dict[str, Any]], base_salaries: Dict[str, float]) -> np.ndarray:
+        """Per-employee cost components for every (role, location) pair"""
+        role_salary = np.array([base_salaries[job["id"]] * job["baseMultiplier"] for job in job_roles], dtype=float)
+        cost_index = np.array([loc["costIndex"] for loc in locations], dtype=float)
+        social_rate = np.array([loc["socialCharges"] for loc in locations], dtype=float)
+        benefits_rate = np.array([loc["benefits"] for loc in locations], dtype=float)
+        premium = np.array([loc["contractorPremium"] for loc in locations], dtype=float)
+
+        base = role_salary[:, None] * cost_index[None, :]
+        contractor_rate = base * premium
+        block = np.zeros((len(job_roles), len(locations), len(cls.EMPLOYMENT_TYPES), len(cls.COST_COMPONENTS)))
+        block[:, :, 0, 0] = base
+        block[:, :, 0, 1] = base * social_rate
+        block[:, :, 0, 2] = base * benefits_rate
+        block[:, :, 1, 0] = contractor_rate
+        block[:, :, 1, 1] = contractor_rate * cls.CONTRACTOR_SOCIAL_CHARGES
+        return block
+
+    # ------------------------------------------------------------------------
+    # Versioned external rate tables. A data directory holds one subdirectory per
+    # version with job_roles.csv/.json and locations.csv/.json; the file CURRENT names
+    # the active version (otherwise the highest version name wins). Each version is
+    # compiled once into .snapshots/<version>.bin, which every worker memory-maps
+    # read-only, so all workers on a host share one copy of the tables.
+    # ------------------------------------------------------------------------
+
+    SNAPSHOT_MAGIC = b"OPTIRATE"
+    ROLE_FIELDS = {"id": str, "name": str, "baseMultiplier": float, "baseSalary": float}
+    LOCATION_FIELDS = {"id": str, "name": str, "costIndex": float, "socialCharges": float, "benefits": float,
+                       "contractorPremium": float, "timezoneGroup": str}
+    RISK_FIELDS = ("fxVolatility", "wageInflation", "wageInflationVolatility", "attrition", "attritionVolatility")
+
+    def active_version(self) -> str:
+        """The version the data directory currently points at"""
+        try:
+            with open(os.path.join(self.data_dir, "CURRENT")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            versions = [name for name in os.listdir(self.data_dir)
+                        if not name.startswith(".") and os.path.isdir(os.path.join(self.data_dir, name))]
+            if not versions:
+                raise ValueError(f"No rate table versions in {self.data_dir}")
+            version = max(versions)
+        if not version or version.startswith(".") or os.sep in version:
+            raise ValueError(f"Invalid rate table version: {version!r}")
+        return version
+
+    @staticmethod
+    def _read_table(directory: str, name: str) -> List[Dict[str, Any]]:
+        json_path, csv_path = os.path.join(directory, name + ".json"), os.path.join(directory, name + ".csv")
+        if os.path.exists(json_path):
+            with open(json_path) as f:
+                return json.load(f)
+        if os.path.exists(csv_path):
+            with open(csv_path, newline="") as f:
+                return list(csv.DictReader(f))
+        raise ValueError(f"Missing {name}.csv or {name}.json in {directory}")
+
+    @staticmethod
+    def _parse_row(row: Dict[str, Any], fields: Dict[str, type], table: str) -> Dict[str, Any]:
+        try:
+            return {field: kind(row[field]) for field, kind in fields.items()}
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid {table} row {row.get('id', row)}: {e}")
+
+    def read_tables(self, version: str) -> Dict[str, Any]:
+        """Parse and validate one version's rate files"""
+        directory = os.path.join(self.data_dir, version)
+        job_roles, base_salaries = [], {}
+        for row in self._read_table(directory, "job_roles"):
+            job = self._parse_row(row, self.ROLE_FIELDS, "job_roles")
+            base_salaries[job["id"]] = job.pop("baseSalary")
+            job_roles.append(job)
+
+        locations, risk_factors = [], {}
+        for row in self._read_table(directory, "locations"):
+            location = self._parse_row(row, self.LOCATION_FIELDS, "locations")
+            if location["timezoneGroup"] not in self.TIMEZONE_GROUPS:
+                raise ValueError(f"Invalid timezoneGroup for location {location['id']}")
+            # Risk columns are optional; a location without them carries no modelled risk
+            risk_factors[location["id"]] = {field: float(row.get(field) or 0.0) for field in self.RISK_FIELDS}
+            locations.append(location)
+
+        if not job_roles or not locations:
+            raise ValueError(f"Rate table version {version} has no job roles or no locations")
+        if len(base_salaries) != len(job_roles) or len(risk_factors) != len(locations):
+            raise ValueError(f"Rate table version {version} has duplicate ids")
+        return {"job_roles": job_roles, "locations": locations, "base_salaries": base_salaries, "risk_factors": risk_factors}
+
+    def compile_snapshot(self, version: str) -> str:
+        """Compile a version into its binary snapshot (once; concurrent compilers race harmlessly)"""
+        snapshot_dir = os.path.join(self.data_dir, ".snapshots")
+        path = os.path.join(snapshot_dir, version + ".bin")
+        if os.path.exists(path):
+            return path
+
+        tables = self.read_tables(version)
+        cost_matrix = self._cost_block(tables["job_roles"], tables["locations"], tables["base_salaries"])
+        unit_cost_matrix = cost_matrix[..., 0] + cost_matrix[..., 1] + cost_matrix[..., 2]
+        header = json.dumps({"version": version, "shape": list(cost_matrix.shape), **tables}).encode()
+        header += b" " * (-(len(self.SNAPSHOT_MAGIC) + 8 + len(header)) % 8)  # keep the arrays 8-byte aligned
+
+        os.makedirs(snapshot_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.SNAPSHOT_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            f.write(cost_matrix.astype("<f8").tobytes())
+            f.write(unit_cost_matrix.astype("<f8").tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    def load_snapshot(self, path: str) -> Dict[str, Any]:
+        """Memory-map a snapshot read-only; the matrices are views onto the shared pages"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic_size = len(self.SNAPSHOT_MAGIC)
+        if mapped[:magic_size] != self.SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a rate table snapshot: {path}")
+        header_size = int.from_bytes(mapped[magic_size:magic_size + 8], "little")
+        offset = magic_size + 8 + header_size
+        header = json.loads(mapped[magic_size + 8:offset])
+
+        shape = tuple(header["shape"])
+        count = int(np.prod(shape))
+        cost_matrix = np.frombuffer(mapped, dtype="<f8", count=count, offset=offset).reshape(shape)
+        unit_cost_matrix = np.frombuffer(mapped, dtype="<f8", count=count // shape[3], offset=offset + count * 8).reshape(shape[:3])
+        return {
+            "data_version": header["version"],
+            "job_roles": header["job_roles"],
+            "locations": header["locations"],
+            "base_salaries": header["base_salaries"],
+            "risk_factors": header["risk_factors"],
+            "role_index": {job["id"]: i for i, job in enumerate(header["job_roles"])},
+            "location_index": {loc["id"]: j for j, loc in enumerate(header["locations"])},
+            "cost_matrix": cost_matrix,
+            "unit_cost_matrix": unit_cost_matrix
+        }
 
-    def get_salary_data(self, job_role: str, location: str) -> Dict[str, Any]:
-        """Simulate real-time salary data fetching with geographic adjustments"""
-        location_data = next((loc for loc in self.locations if loc["id"] == location), None)
-        job_data = next((job for job in self.job_roles if job["id"] == job_role), None)
+    def reload(self) -> bool:
+        """Switch to the data directory's active version if it changed; True when it did"""
+        with self._reload_lock:
+            version = self.active_version()
+            if version == self.data_version:
+                return False
+            state = self.load_snapshot(self.compile_snapshot(version))
+            # One dict update swaps every table together; the new revision invalidates cached allocations
+            state["revision"] = self.revision + 1
+            self.__dict__.update(state)
+            return True
+
+    def poll(self) -> None:
+        """Cheap per-request check for a newly published version, at most every poll_interval seconds"""
+        if not self.data_dir or time.monotonic() < self._next_poll:
+            return
+        self._next_poll = time.monotonic() + self.poll_interval
+        try:
+            self.reload()
+        except Exception as e:
+            # Keep serving the version already loaded rather than failing requests
+            print(f"Rate table reload failed: {str(e)}")
+
+    def export_tables(self, directory: str) -> None:
+        """Write the loaded tables as a version directory (job_roles.csv, locations.csv), e.g. to seed a data directory"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "job_roles.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.ROLE_FIELDS))
+            writer.writeheader()
+            for job in self.job_roles:
+                writer.writerow({**job, "baseSalary": self.base_salaries[job["id"]]})
+        with open(os.path.join(directory, "locations.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.LOCATION_FIELDS) + list(self.RISK_FIELDS))
+            writer.writeheader()
+            for loc in self.locations:
+                writer.writerow({**{field: loc[field] for field in self.LOCATION_FIELDS}, **self.risk_factors[loc["id"]]})
+
+    def update_location(self, location: str, **rates: float) -> None:
+        """Change a location's rates (costIndex, socialCharges, ...) and rebuild only its column"""
+        if location not in self.location_index:
+            raise ValueError("Invalid job role or location")
+        self.locations[self.location_index[location]].update(rates)
+        self._fill_costs(range(len(self.job_roles)), [self.location_index[location]])
 
-        if not location_data or not job_data:
+    def update_job_role(self, job_role: str, base_salary: Optional[float] = None, base_multiplier: Optional[float] = None) -> None:
+        """Change a role's base salary or multiplier and rebuild only its row"""
+        if job_role not in self.role_index:
+            raise ValueError("Invalid job role or location")
+        if base_salary is not None:
+            self.base_salaries[job_role] = base_salary
+        if base_multiplier is not None:
+            self.job_roles[self.role_index[job_role]]["baseMultiplier"] = base_multiplier
+        self._fill_costs([self.role_index[job_role]], range(len(self.locations)))
+
+    def cost_indices(self, job_role: str, location: str) -> Tuple[int, int]:
+        """O(1) matrix coordinates for a role and location"""
+        try:
+            return self.role_index[job_role], self.location_index[location]
+        except KeyError:
             raise ValueError("Invalid job role or location")
 
-        base_salary = self.base_salaries[job_role]
-        adjusted_salary = base_salary * job_data["baseMultiplier"] * location_data["costIndex"]
+    def get_salary_data(self, job_role: str, location: str) -> Dict[str, Any]:
+        """Simulate real-time salary data fetching with geographic adjustments"""
+        i, j = self.cost_indices(job_role, location)
+        location_data = self.locations[j]
 
         return {
-            "base_salary": adjusted_salary,
+            "base_salary": float(self.cost_matrix[i, j, 0, 0]),
             "location_data": location_data,
-            "job_data": job_data,
+            "job_data": self.job_roles[i],
             "social_charges_rate": location_data["socialCharges"],
             "benefits_rate": location_data["benefits"],
             "contractor_premium": location_data["contractorPremium"]
@@ -255,184 +555,1058 @@ class DataIngestionService:
             "avg_cost_per_employee": total_cost / headcount,
             "description": "Current baseline approach"
         }'''
+def _min_cost_flow(node_count: int, edges: List[Tuple[int, int, int, float]], source: int, sink: int) -> Tuple[int, List[int]]:
+    """Successive-shortest-path min-cost max-flow on a small graph
+
+    ``edges`` are (from, to, capacity, unit_cost). Returns the total flow and the
+    flow on each input edge. Each augmentation pushes the full bottleneck, so the
+    number of iterations depends on the graph size, not on the flow value.
+    """
+    graph = [[] for _ in range(node_count)]
+    # Residual arcs as [to, capacity, cost, index of reverse arc]
+    arcs = []
+    for u, v, capacity, cost in edges:
+        graph[u].append(len(arcs))
+        arcs.append([v, capacity, cost, len(arcs) + 1])
+        graph[v].append(len(arcs))
+        arcs.append([u, 0, -cost, len(arcs) - 1])
+
+    total = 0
+    while True:
+        distance = [math.inf] * node_count
+        via = [-1] * node_count
+        distance[source] = 0.0
+        for _ in range(node_count - 1):
+            changed = False
+            for u in range(node_count):
+                if distance[u] == math.inf:
+                    continue
+                for a in graph[u]:
+                    v, capacity, cost, _ = arcs[a]
+                    if capacity > 0 and distance[u] + cost < distance[v] - 1e-9:
+                        distance[v] = distance[u] + cost
+                        via[v] = a
+                        changed = True
+            if not changed:
+                break
+        if distance[sink] == math.inf:
+            break
+
+        push = math.inf
+        v = sink
+        while v != source:
+            a = via[v]
+            push = min(push, arcs[a][1])
+            v = arcs[arcs[a][3]][0]
+        v = sink
+        while v != source:
+            a = via[v]
+            arcs[a][1] -= push
+            arcs[arcs[a][3]][1] += push
+            v = arcs[arcs[a][3]][0]
+        total += push
+
+    return total, [arcs[2 * k + 1][1] for k in range(len(edges))]
+
+
+class ScenarioSet:
+    """A group of scenarios held as arrays until a response needs them as JSON
+
+    counts and line_costs are (scenarios x locations x employment types); unit_costs is
+    the (locations x employment types) price of one role, or None when the scenarios mix
+    roles (a batch aggregate). Batches slice their rows out of shared arrays, so holding
+    a ScenarioSet per line copies nothing.
+    """
+
+    __slots__ = ("specs", "headcount", "counts", "unit_costs", "_line_costs", "limits", "locations")
+
+    def __init__(self, specs, headcount: int, counts: np.ndarray, locations: List[Dict[str, Any]],
+                 unit_costs: Optional[np.ndarray] = None, line_costs: Optional[np.ndarray] = None, limits=None):
+        self.specs = specs  # (key, name, description) per scenario row
+        self.headcount = headcount
+        self.counts = counts
+        self.unit_costs = unit_costs
+        self._line_costs = line_costs
+        self.limits = limits
+        self.locations = locations
+
+    @property
+    def line_costs(self) -> np.ndarray:
+        # Priced on demand rather than held: one small multiply is cheaper than its memory per result
+        return self.counts * self.unit_costs[None, :, :] if self._line_costs is None else self._line_costs
+
+    @property
+    def totals(self) -> np.ndarray:
+        return self.line_costs.sum(axis=(1, 2))
+
+    def total_cost(self, key: str) -> float:
+        return float(self.line_costs[[spec[0] for spec in self.specs].index(key)].sum())
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Every scenario as the dict the API returns, in row order"""
+        # One tolist() per array: indexing numpy scalars cell by cell costs more than the dicts
+        counts, line_costs = self.counts.tolist(), self.line_costs.tolist()
+        unit_costs = self.unit_costs.tolist() if self.unit_costs is not None else None
+        return [self._scenario(k, counts[k], line_costs[k], unit_costs) for k in range(len(self.specs))]
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {key: row for (key, _, _), row in zip(self.specs, self.rows())}
+
+    def _scenario(self, k: int, counts: List[List[int]], line_costs: List[List[float]], unit_costs) -> Dict[str, Any]:
+        _, name, description = self.specs[k]
+        # Largest group first, cheaper first among equals (cell order without unit costs)
+        cells = [(j, t, count) for j, row in enumerate(counts) for t, count in enumerate(row) if count]
+        cells.sort(key=lambda cell: (-cell[2], unit_costs[cell[0]][cell[1]] if unit_costs else 0.0))
+
+        allocation = []
+        total_cost = 0.0
+        for j, t, count in cells:
+            line = {"location": self.locations[j]["name"], "type": "FTE" if t == 0 else "Contractor", "count": count}
+            if unit_costs:
+                line["unit_cost"] = unit_costs[j][t]
+            line["total_cost"] = line_costs[j][t]
+            allocation.append(line)
+            total_cost += line_costs[j][t]
+
+        scenario = {
+            "name": name,
+            "allocation": allocation,
+            "total_cost": total_cost,
+            "avg_cost_per_employee": total_cost / self.headcount if self.headcount else 0.0,
+            "description": description
+        }
+        if self.limits is not None and self.limits[k] is not None:
+            scenario["constraints"] = self.limits[k]
+        return scenario
+
+
 class OptimizationEngine:
+    """Phase 2: Generates cost-optimized workforce scenarios"""
+
+    # Business constraint presets selectable from the dashboard. A constraint may also be a
+    # dict with any of these keys (plus an optional "preset" to start from).
+    CONSTRAINT_PRESETS = {
+        "cost-focused": {"max_country_share": 1.0, "min_fte_ratio": 0.0, "min_contractor_ratio": 0.0, "timezone_groups": None},
+        "balanced": {"max_country_share": 0.5, "min_fte_ratio": 0.3, "min_contractor_ratio": 0.0, "timezone_groups": None},
+        "quality-focused": {"max_country_share": 0.4, "min_fte_ratio": 0.6, "min_contractor_ratio": 0.0, "timezone_groups": None}
+    }
+    # The "Balanced Approach" scenario tightens the requested constraints to at least these
+    BALANCED_LIMITS = {"max_country_share": 0.4, "min_fte_ratio": 0.5}
+
     def __init__(self, data_service):
         self.data_service = data_service
+        self._allocation_cache = OrderedDict()
+        self._frontier_cache = OrderedDict()
+        # Guards both caches; solves run outside it, so two threads may race to fill one key
+        self._cache_lock = threading.Lock()
+        self.frontier_exact_headcount = int(os.environ.get("OPTIFORCE_FRONTIER_EXACT_HEADCOUNT", 40))
 
     def calculate_fte_cost(self, job_role, location, headcount):
-        salary_data = self.data_service.get_salary_data(job_role, location)
-        base_salary = salary_data["base_salary"]
-        social_charges = base_salary * salary_data["social_charges_rate"]
-        benefits = base_salary * salary_data["benefits_rate"]
-        total_cost = base_salary + social_charges + benefits
-        return {
-            "base_salary": base_salary,
-            "social_charges": social_charges,
-            "benefits": benefits,
-            "total_cost": total_cost * headcount,
-            "type": "FTE"
-        }
+        return self._calculate_cost(job_role, location, headcount, 0, "FTE")
 
     def calculate_contractor_cost(self, job_role, location, headcount):
-        salary_data = self.data_service.get_salary_data(job_role, location)
-        base_salary = salary_data["base_salary"]
-        contractor_rate = base_salary * salary_data["contractor_premium"]
-        social_charges = contractor_rate * 0.05
-        benefits = 0
-        total_cost = contractor_rate + social_charges
+        return self._calculate_cost(job_role, location, headcount, 1, "Contractor")
+
+    def _calculate_cost(self, job_role, location, headcount, employment_index, label):
+        i, j = self.data_service.cost_indices(job_role, location)
+        base_salary, social_charges, benefits = self.data_service.cost_matrix[i, j, employment_index].tolist()
         return {
-            "base_salary": contractor_rate,
+            "base_salary": base_salary,
             "social_charges": social_charges,
             "benefits": benefits,
-            "total_cost": total_cost * headcount,
-            "type": "Contractor"
+            "total_cost": float(self.data_service.unit_cost_matrix[i, j, employment_index]) * headcount,
+            "type": label
         }
 
-    def generate_scenarios(self, job_role, primary_location, headcount, constraint, employment_type):
-        scenarios = {}
+    def cost_grid(self, job_roles=None, locations=None, employment_types=None, headcount: int = 1) -> Dict[str, Any]:
+        """Cost breakdown for every (role, location, employment type) cell in one gather
+
+        Each component is a nested list indexed [role][location][employment type] in the
+        order of the returned axes; omitted axes cover everything in the rate table, and
+        "both" (as the optimizer spells it) stands for FTE and contractor.
+        """
+        if headcount <= 0:
+            raise ValueError("Headcount must be positive")
+        data = self.data_service
+        job_roles = list(job_roles) if job_roles else [job["id"] for job in data.job_roles]
+        locations = list(locations) if locations else [loc["id"] for loc in data.locations]
+        employment_types = list(employment_types) if employment_types else list(data.EMPLOYMENT_TYPES)
+        if "both" in employment_types:
+            employment_types = [t for t in employment_types if t != "both"] + [t for t in data.EMPLOYMENT_TYPES if t not in employment_types]
+        try:
+            roles = [data.role_index[job_role] for job_role in job_roles]
+            places = [data.location_index[location] for location in locations]
+        except KeyError:
+            raise ValueError("Invalid job role or location")
+        if not set(employment_types) <= set(data.EMPLOYMENT_TYPES):
+            raise ValueError(f"Employment type must be one of {', '.join(data.EMPLOYMENT_TYPES)} or both")
+        types = [data.EMPLOYMENT_TYPES.index(employment_type) for employment_type in employment_types]
+
+        cells = np.ix_(roles, places, types)
+        components = data.cost_matrix[cells]
+        unit_costs = data.unit_cost_matrix[cells]
+        grid = {"job_roles": job_roles, "locations": locations, "employment_types": employment_types, "headcount": headcount}
+        for k, component in enumerate(data.COST_COMPONENTS):
+            grid[component] = components[..., k].tolist()
+        grid["unit_cost"] = unit_costs.tolist()
+        grid["total_cost"] = (unit_costs * headcount).tolist()
+        return grid
+
+    def resolve_constraints(self, constraint, employment_type) -> Dict[str, Any]:
+        """Turn a preset name or constraint dict into validated solver limits"""
+        if isinstance(constraint, dict):
+            overrides = dict(constraint)
+            preset = overrides.pop("preset", "cost-focused")
+        else:
+            overrides, preset = {}, constraint or "balanced"
+        if preset not in self.CONSTRAINT_PRESETS:
+            raise ValueError(f"Unknown constraint preset: {preset}")
+        unknown = set(overrides) - set(self.CONSTRAINT_PRESETS[preset])
+        if unknown:
+            raise ValueError(f"Unknown constraint keys: {', '.join(sorted(unknown))}")
+
+        limits = dict(self.CONSTRAINT_PRESETS[preset], **overrides)
+        for key in ("max_country_share", "min_fte_ratio", "min_contractor_ratio"):
+            limits[key] = float(limits[key])
+            if not 0.0 <= limits[key] <= 1.0:
+                raise ValueError(f"{key} must be between 0 and 1")
+        if limits["max_country_share"] == 0.0:
+            raise ValueError("max_country_share must be greater than 0")
+
+        # A single employment type overrides any ratio between the two
+        if employment_type == 'fte':
+            limits["min_contractor_ratio"] = 0.0
+        elif employment_type == 'contractor':
+            limits["min_fte_ratio"] = 0.0
+        if limits["min_fte_ratio"] + limits["min_contractor_ratio"] > 1.0:
+            raise ValueError("min_fte_ratio and min_contractor_ratio cannot add up to more than 1")
+        if limits["timezone_groups"] is not None:
+            groups = limits["timezone_groups"]
+            known = self.data_service.TIMEZONE_GROUPS
+            if not isinstance(groups, list) or not groups or not all(isinstance(group, str) and group in known for group in groups):
+                raise ValueError(f"timezone_groups must be a non-empty list of {', '.join(known)}")
+            limits["timezone_groups"] = sorted(set(groups))
+        return limits
+
+    def solve_allocation(self, job_role: str, headcount: int, limits: Dict[str, Any], employment_type: str = 'both') -> List[Tuple[int, int, int]]:
+        """Cost-minimal integer allocation as (location index, employment index, count) lines"""
+        i = self.data_service.role_index.get(job_role)
+        if i is None:
+            raise ValueError("Invalid job role or location")
+        counts = self.allocation_counts(headcount, limits, employment_type)
+        return self._allocation_lines(counts, self.data_service.unit_cost_matrix[i])
+
+    @staticmethod
+    def _limits_key(limits: Dict[str, Any]) -> Tuple:
+        """Hashable form of resolved limits for cache keys (a fraction of json.dumps' cost)"""
+        return tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in sorted(limits.items()))
+
+    def allocation_counts(self, headcount: int, limits: Dict[str, Any], employment_type: str = 'both') -> np.ndarray:
+        """Cost-minimal headcount per (location, employment type), as a locations x 2 array
+
+        Every cost component is linear in the role's salary, so each role's unit costs are
+        the same location/type profile scaled by a constant and the optimal allocation does
+        not depend on the role. Solutions are cached per cost-data revision.
+        """
+        key = (self.data_service.revision, headcount, self._limits_key(limits), employment_type)
+        with self._cache_lock:
+            counts = self._allocation_cache.get(key)
+            if counts is not None:
+                self._allocation_cache.move_to_end(key)
+        metrics.inc("optiforce_allocation_cache_total", result="miss" if counts is None else "hit")
+        if counts is None:
+            with metrics.stage("solve"):
+                counts = self._solve_counts(headcount, limits, employment_type)
+            with self._cache_lock:
+                self._allocation_cache[key] = counts
+                while len(self._allocation_cache) > 4096:
+                    self._allocation_cache.popitem(last=False)
+        return counts
+
+    def _solve_counts(self, headcount: int, limits: Dict[str, Any], employment_type: str) -> np.ndarray:
+        """Per-country caps are ``max_country_share`` of the headcount rounded up to whole
+        positions; FTE and contractor minimums are rounded up likewise."""
+        # Any role's row has the shared cost profile; the first one is as good as any
+        unit_costs = self.data_service.unit_cost_matrix[0]
+
+        allowed_groups = limits["timezone_groups"]
+        locations = [j for j, loc in enumerate(self.data_service.locations)
+                     if allowed_groups is None or loc.get("timezoneGroup") in allowed_groups]
+        types = {'fte': [0], 'contractor': [1]}.get(employment_type, [0, 1])
+
+        cap, min_fte, min_contractor = (int(v[0]) for v in self._position_limits(np.array([headcount]), limits))
+
+        # source -> {required FTE, required contractor, free} -> (location, type) slots -> location -> sink
+        source, required_fte, required_contractor, free = 0, 1, 2, 3
+        slot_node = {(j, t): 4 + k * 2 + t for k, j in enumerate(locations) for t in (0, 1)}
+        location_node = {j: 4 + 2 * len(locations) + k for k, j in enumerate(locations)}
+        sink = 4 + 3 * len(locations)
+
+        edges = [(source, required_fte, min_fte, 0.0), (source, required_contractor, min_contractor, 0.0),
+                 (source, free, headcount - min_fte - min_contractor, 0.0)]
+        slot_edges = {}
+        for j in locations:
+            for t in types:
+                edges.append((required_fte if t == 0 else required_contractor, slot_node[(j, t)], headcount, 0.0))
+                edges.append((free, slot_node[(j, t)], headcount, 0.0))
+                slot_edges[(j, t)] = len(edges)
+                edges.append((slot_node[(j, t)], location_node[j], headcount, float(unit_costs[j, t])))
+            edges.append((location_node[j], sink, cap, 0.0))
+
+        total, flows = _min_cost_flow(sink + 1, edges, source, sink)
+        if total < headcount:
+            raise ValueError("No allocation satisfies these constraints; relax the country share, timezone or employment limits")
+
+        counts = np.zeros((len(self.data_service.locations), 2), dtype=np.int64)
+        for (j, t), k in slot_edges.items():
+            counts[j, t] = flows[k]
+        counts.setflags(write=False)
+        return counts
+
+    @staticmethod
+    def _position_limits(headcounts: np.ndarray, limits: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-country cap and FTE/contractor minimums in whole positions, for each headcount
+
+        Shares round up; the 1e-9 keeps float noise (0.3 * 10 = 3.0000000000000004) from
+        costing an extra position.
+        """
+        def whole_positions(ratio):
+            return np.ceil(ratio * headcounts - 1e-9).astype(np.int64)
+
+        cap = whole_positions(limits["max_country_share"])
+        min_fte = whole_positions(limits["min_fte_ratio"])
+        min_contractor = np.minimum(whole_positions(limits["min_contractor_ratio"]), headcounts - min_fte)
+        return cap, min_fte, min_contractor
+
+    @staticmethod
+    def _allocation_lines(counts: np.ndarray, unit_costs: np.ndarray) -> List[Tuple[int, int, int]]:
+        """Non-empty cells of a counts array, largest group first"""
+        lines = [(int(j), int(t), int(counts[j, t])) for j, t in zip(*np.nonzero(counts))]
+        return sorted(lines, key=lambda line: (-line[2], unit_costs[line[0], line[1]]))
+
+    SCENARIOS = (
+        ("cost_effective", "Most Cost-Effective Mix", "Optimized for maximum cost savings"),
+        ("balanced", "Balanced Approach", "Balances cost, risk, and talent quality"),
+        ("current", "Current Strategy", "Current baseline approach")
+    )
+
+    def scenario_limits(self, constraint, employment_type) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Solver limits for the cost-effective and balanced scenarios"""
+        limits = self.resolve_constraints(constraint, employment_type)
 
+        # Balanced tightens diversification, but not below what the allowed locations can hold, and
+        # never loosens the caller's own cap: a cap too tight to place everyone stays infeasible
+        allowed = sum(1 for loc in self.data_service.locations
+                      if limits["timezone_groups"] is None or loc.get("timezoneGroup") in limits["timezone_groups"])
+        balanced_limits = dict(limits)
+        balanced_limits["max_country_share"] = min(limits["max_country_share"], max(self.BALANCED_LIMITS["max_country_share"], 1.0 / max(allowed, 1)))
         if employment_type == 'both':
-            # Example: 70% contractors, 30% FTE for cost-effective
-            contractor_count = int(headcount * 0.7)
-            fte_count = headcount - contractor_count
-
-            allocation = []
-            total_cost = 0
-
-            if contractor_count > 0:
-                contractor_cost = self.calculate_contractor_cost(job_role, "india", contractor_count)
-                allocation.append({
-                    "location": "India",
-                    "type": "Contractor",
-                    "count": contractor_count,
-                    "unit_cost": contractor_cost["total_cost"] / contractor_count,
-                    "total_cost": contractor_cost["total_cost"]
-                })
-                total_cost += contractor_cost["total_cost"]
-
-            if fte_count > 0:
-                fte_cost = self.calculate_fte_cost(job_role, "philippines", fte_count)
-                allocation.append({
-                    "location": "Philippines",
-                    "type": "FTE",
-                    "count": fte_count,
-                    "unit_cost": fte_cost["total_cost"] / fte_count,
-                    "total_cost": fte_cost["total_cost"]
-                })
-                total_cost += fte_cost["total_cost"]
-
-            scenarios["cost_effective"] = {
-                "name": "Most Cost-Effective Mix",
-                "allocation": allocation,
-                "total_cost": total_cost,
-                "avg_cost_per_employee": total_cost / headcount,
-                "description": "Optimized for maximum cost savings"
-            }
+            balanced_limits["min_fte_ratio"] = min(max(limits["min_fte_ratio"], self.BALANCED_LIMITS["min_fte_ratio"]), 1.0 - limits["min_contractor_ratio"])
+        return limits, balanced_limits
+
+    def scenario_counts(self, primary: int, headcount: int, limits, balanced_limits, employment_type) -> np.ndarray:
+        """Headcount per scenario x location x employment type, in SCENARIOS order"""
+        counts = np.zeros((len(self.SCENARIOS), len(self.data_service.locations), 2), dtype=np.int64)
+        counts[0] = self.allocation_counts(headcount, limits, employment_type)
+        counts[1] = self.allocation_counts(headcount, balanced_limits, employment_type)
+        # Current strategy: everyone in the primary location (FTE unless contractors were requested)
+        counts[2, primary, 1 if employment_type == 'contractor' else 0] = headcount
+        return counts
+
+    def scenario_set(self, job_role, primary_location, headcount, constraint, employment_type) -> ScenarioSet:
+        """The three standard scenarios as arrays; see generate_scenarios for the JSON form"""
+        if headcount <= 0:
+            raise ValueError("Headcount must be positive")
+        i, primary = self.data_service.cost_indices(job_role, primary_location)
+        limits, balanced_limits = self.scenario_limits(constraint, employment_type)
+        counts = self.scenario_counts(primary, headcount, limits, balanced_limits, employment_type)
+        return ScenarioSet(self.SCENARIOS, headcount, counts, self.data_service.locations,
+                           self.data_service.unit_cost_matrix[i], limits=(limits, balanced_limits, None))
 
-            # Balanced scenario (example: 40% contractors, 60% FTE split)
-            india_count = int(headcount * 0.4)
-            portugal_count = int(headcount * 0.35)
-            poland_count = headcount - india_count - portugal_count
-
-            allocation = []
-            total_cost = 0
-
-            if india_count > 0:
-                contractor_cost = self.calculate_contractor_cost(job_role, "india", india_count)
-                allocation.append({
-                    "location": "India",
-                    "type": "Contractor",
-                    "count": india_count,
-                    "unit_cost": contractor_cost["total_cost"] / india_count,
-                    "total_cost": contractor_cost["total_cost"]
-                })
-                total_cost += contractor_cost["total_cost"]
-
-            if portugal_count > 0:
-                fte_cost = self.calculate_fte_cost(job_role, "portugal", portugal_count)
-                allocation.append({
-                    "location": "Portugal",
-                    "type": "FTE",
-                    "count": portugal_count,
-                    "unit_cost": fte_cost["total_cost"] / portugal_count,
-                    "total_cost": fte_cost["total_cost"]
-                })
-                total_cost += fte_cost["total_cost"]
-
-            if poland_count > 0:
-                fte_cost = self.calculate_fte_cost(job_role, "poland", poland_count)
-                allocation.append({
-                    "location": "Poland",
-                    "type": "FTE",
-                    "count": poland_count,
-                    "unit_cost": fte_cost["total_cost"] / poland_count,
-                    "total_cost": fte_cost["total_cost"]
-                })
-                total_cost += fte_cost["total_cost"]
-
-            scenarios["balanced"] = {
-                "name": "Balanced Approach",
-                "allocation": allocation,
-                "total_cost": total_cost,
-                "avg_cost_per_employee": total_cost / headcount,
-                "description": "Balances cost, risk, and talent quality"
+    def generate_scenarios(self, job_role, primary_location, headcount, constraint, employment_type):
+        return self.scenario_set(job_role, primary_location, headcount, constraint, employment_type).to_dict()
+
+    # Weights of the risk score's components, each a share between 0 and 1:
+    # country concentration (Herfindahl index of the location shares), contractor
+    # share, and timezone spread (share outside the primary location's timezone group)
+    RISK_WEIGHTS = {"concentration": 0.5, "contractor_share": 0.25, "timezone_spread": 0.25}
+
+    def resolve_risk_weights(self, weights=None) -> Dict[str, float]:
+        weights = dict(self.RISK_WEIGHTS, **(weights or {}))
+        unknown = set(weights) - set(self.RISK_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown risk weights: {', '.join(sorted(unknown))}")
+        weights = {key: float(value) for key, value in weights.items()}
+        if min(weights.values()) < 0 or sum(weights.values()) <= 0:
+            raise ValueError("Risk weights must be non-negative and not all zero")
+        total = sum(weights.values())
+        return {key: value / total for key, value in weights.items()}
+
+    def allocation_risk(self, counts: np.ndarray, primary: int, weights: Dict[str, float]) -> Dict[str, float]:
+        """Risk score of a locations x 2 allocation (0 = no risk, 1 = worst), with its components"""
+        headcount = counts.sum()
+        location_totals = counts.sum(axis=1)
+        zone = self.data_service.locations[primary].get("timezoneGroup")
+        outside = np.array([loc.get("timezoneGroup") != zone for loc in self.data_service.locations])
+        components = {
+            "concentration": float(((location_totals / headcount) ** 2).sum()),
+            "contractor_share": float(counts[:, 1].sum() / headcount),
+            "timezone_spread": float(location_totals[outside].sum() / headcount)
+        }
+        components["score"] = sum(weights[key] * components[key] for key in self.RISK_WEIGHTS)
+        return components
+
+    def _risk_scores(self, counts: np.ndarray, primary: int, weights: Dict[str, float]) -> np.ndarray:
+        """allocation_risk's score for a stack of allocations (n x locations x 2) at once"""
+        headcount = counts.sum(axis=(1, 2))
+        shares = counts.sum(axis=2) / headcount[:, None]
+        zone = self.data_service.locations[primary].get("timezoneGroup")
+        outside = np.array([loc.get("timezoneGroup") != zone for loc in self.data_service.locations])
+        return (weights["concentration"] * (shares ** 2).sum(axis=1)
+                + weights["contractor_share"] * counts[:, :, 1].sum(axis=1) / headcount
+                + weights["timezone_spread"] * shares[:, outside].sum(axis=1))
+
+    def frontier_counts(self, headcount: int, limits: Dict[str, Any], employment_type: str, primary: int,
+                        weights: Dict[str, float]) -> Tuple[List[np.ndarray], int]:
+        """Pareto-optimal allocations on cost vs risk score, cheapest first, and the block size they were found at
+
+        Costs scale with the role's salary and the risk score doesn't depend on the role,
+        so the frontier is shared across roles; only the primary location's timezone group
+        matters. Up to frontier_exact_headcount positions the search is exact; above it
+        positions move in blocks of ceil(headcount / frontier_exact_headcount), which keeps
+        the search size flat as the headcount grows.
+        """
+        zone = self.data_service.locations[primary].get("timezoneGroup")
+        key = (self.data_service.revision, headcount, self._limits_key(limits), employment_type, zone,
+               json.dumps(weights, sort_keys=True))
+        with self._cache_lock:
+            result = self._frontier_cache.get(key)
+            if result is not None:
+                self._frontier_cache.move_to_end(key)
+        if result is None:
+            block = -(-headcount // self.frontier_exact_headcount)
+            # A block that divides the headcount spares the search tracking a remainder
+            block = next((b for b in range(block, block * 3 // 2 + 1) if headcount % b == 0), block)
+            while True:
+                try:
+                    frontier = self._solve_frontier(headcount, limits, employment_type, primary, weights, block)
+                    break
+                except ValueError:
+                    # Coarse blocks can miss allocations that tight limits only allow position by position
+                    if block == 1:
+                        raise
+                    block = max(1, block // 2)
+            if block > 1:
+                # Blocks can miss the exact cost minimum, so the solver's optimum anchors the cheap end
+                frontier.append(self.allocation_counts(headcount, limits, employment_type))
+                unit_costs = self.data_service.unit_cost_matrix[0]
+                costs = np.array([(counts * unit_costs).sum() for counts in frontier])
+                risks = np.array([self.allocation_risk(counts, primary, weights)["score"] for counts in frontier])
+                order = np.argsort(risks, kind="stable")
+                frontier, costs, risks = [frontier[k] for k in order], costs[order], risks[order]
+                frontier = [frontier[k] for k in self._pareto_mask(np.zeros(len(frontier), dtype=np.int64), costs, risks)]
+            result = (frontier, block)
+            with self._cache_lock:
+                self._frontier_cache[key] = result
+                while len(self._frontier_cache) > 256:
+                    self._frontier_cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _pareto_mask(groups: np.ndarray, costs: np.ndarray, risks: np.ndarray) -> np.ndarray:
+        """Indices (cost order) of the labels no other label in the same group matches or beats on both objectives"""
+        # Two stable argsorts beat lexsort; equal-cost labels keep their input order, so a
+        # label only survives an equal-cost one with lower risk if the input put it first
+        order = np.argsort(costs, kind="stable")
+        order = order[np.argsort(groups[order], kind="stable")]
+        sorted_groups = groups[order]
+        # Offsetting each group below the previous one makes a running minimum restart at every group
+        shifted = risks[order] - sorted_groups * (risks.max() - risks.min() + 1.0)
+        best_before = np.concatenate(([np.inf], np.minimum.accumulate(shifted)[:-1]))
+        first = np.concatenate(([True], sorted_groups[1:] != sorted_groups[:-1]))
+        return order[first | (shifted < best_before - 1e-12)]
+
+    def _solve_frontier(self, headcount: int, limits: Dict[str, Any], employment_type: str, primary: int,
+                        weights: Dict[str, float], block: int = 1) -> List[np.ndarray]:
+        """Bi-objective search over allocations, by dynamic programming over locations
+
+        Risk is a sum of per-location terms (concentration, timezone spread) plus the
+        contractor share, so for given location totals and contractor count the cheapest
+        split converts FTEs to contractors in order of the contractor premium. Every
+        frontier allocation therefore has that shape: with locations in premium order, a
+        run of all-contractor locations, at most one mixed location, then all-FTE
+        locations. The search walks the locations in that order keeping, per phase
+        (still in the contractor run or past it) and positions placed so far, only the
+        labels no other label beats on both cost and risk.
+
+        With block > 1 location totals are multiples of block or the country cap, and the
+        mixed location's contractors are multiples of block or exactly what the contractor
+        limits need; block = 1 is the exact frontier. The search then places the headcount
+        less its remainder, and the remainder is added afterwards to whichever location and
+        employment type each allocation takes it best, which costs one vectorized pass
+        instead of a second copy of every label.
+        """
+        unit_costs = self.data_service.unit_cost_matrix[0]
+        locations = self.data_service.locations
+        zone = locations[primary].get("timezoneGroup")
+        allowed_groups = limits["timezone_groups"]
+        premium = unit_costs[:, 1] - unit_costs[:, 0]
+        order = sorted((j for j, loc in enumerate(locations) if allowed_groups is None or loc.get("timezoneGroup") in allowed_groups),
+                       key=lambda j: (premium[j], j))
+
+        cap, min_fte, min_contractor = (int(v[0]) for v in self._position_limits(np.array([headcount]), limits))
+        cap = min(cap, headcount)
+        max_contractors = headcount - min_fte
+        if employment_type == 'fte':
+            max_contractors = 0
+        elif employment_type == 'contractor':
+            min_contractor = headcount
+        if cap * len(order) < headcount:
+            raise ValueError("No allocation satisfies these constraints; relax the country share, timezone or employment limits")
+
+        remainder = headcount % block
+        # The search places whole blocks only; the remainder may still add to the contractors
+        target, required_contractors = headcount - remainder, min_contractor
+        min_contractor = max(0, min_contractor - remainder)
+        blocks = np.union1d(np.arange(0, cap + 1, block), [cap])
+        positions = np.arange(cap + 1)
+        # Labels: positions placed, phase (0 = contractor run, 1 = past it), cost, risk
+        placed, phase = np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+        cost, risk = np.zeros(1), np.zeros(1)
+        layers = []
+        for step, j in enumerate(order):
+            location_risk = weights["concentration"] * (positions / headcount) ** 2
+            if locations[j].get("timezoneGroup") != zone:
+                location_risk = location_risk + weights["timezone_spread"] * positions / headcount
+            contractor_risk = weights["contractor_share"] / headcount
+            fte_cost, contractor_cost = float(unit_costs[j, 0]), float(unit_costs[j, 1])
+
+            parts = []
+
+            def extend(labels, size_grid, contractors, next_phase):
+                """Candidates placing size_grid positions (contractors of them) at j after each label"""
+                parent = np.broadcast_to(labels[:, None], size_grid.shape)
+                keep = contractors <= size_grid
+                parts.append(tuple(np.broadcast_to(a, size_grid.shape)[keep] for a in (
+                    parent, size_grid, contractors, placed[labels][:, None] + size_grid, np.full(size_grid.shape, next_phase),
+                    cost[labels][:, None] + fte_cost * (size_grid - contractors) + contractor_cost * contractors,
+                    risk[labels][:, None] + location_risk[size_grid] + contractor_risk * contractors)))
+
+            labels = np.arange(len(placed))
+            grid = np.broadcast_to(blocks[None, :], (len(labels), len(blocks)))
+            run, past = phase == 0, phase == 1
+            # Past the contractor run: all FTE
+            extend(labels[past], grid[past], np.zeros_like(grid[past]), 1)
+            # Still in the run: all contractor, within the contractor maximum
+            run, run_grid = labels[run], grid[run]
+            run_placed = placed[run][:, None]
+            extend(run, run_grid, np.where(run_placed + run_grid <= max_contractors, run_grid, run_grid + 1), 0)
+            # Leave the run here with k contractors, settling the final contractor count
+            shortfall = np.maximum(0, min_contractor - placed[run])[:, None]
+            splits = [np.broadcast_to(shortfall, run_grid.shape)]
+            if premium[j] < 0:
+                # Contractors cost less here, so any count up to the location total may pay off
+                splits += [np.full(run_grid.shape, k) for k in blocks]
+                splits.append(np.broadcast_to(max_contractors - run_placed, run_grid.shape))
+            for contractors in splits:
+                total = run_placed + contractors
+                valid = (total >= min_contractor) & (total <= max_contractors) & (contractors >= shortfall)
+                extend(run, run_grid, np.where(valid, contractors, run_grid + 1), 1)
+
+            parent, size, contractors, placed, phase, cost, risk = (np.concatenate(column) for column in zip(*parts))
+            # Drop labels that overshoot or can no longer reach the target, then dominated ones
+            remaining = int(blocks[-1]) * (len(order) - step - 1)
+            feasible = np.nonzero((placed <= target) & (placed + remaining >= target))[0]
+            groups = phase[feasible] * (target + 1) + placed[feasible]
+            keep = feasible[self._pareto_mask(groups, cost[feasible], risk[feasible])]
+            parent, size, contractors, placed, phase, cost, risk = (
+                a[keep] for a in (parent, size, contractors, placed, phase, cost, risk))
+            layers.append((j, parent, size, contractors))
+
+        done = np.nonzero((placed == target) & ((phase == 1) | (placed <= max_contractors) & (placed >= min_contractor)))[0]
+        if done.size == 0:
+            raise ValueError("No allocation satisfies these constraints; relax the country share, timezone or employment limits")
+        done = done[np.argsort(risk[done], kind="stable")]
+        done = done[self._pareto_mask(np.zeros(done.size, dtype=np.int64), cost[done], risk[done])]
+
+        frontier = np.zeros((len(done), len(locations), 2), dtype=np.int64)
+        labels = done
+        for j, parent, size, contractors in reversed(layers):
+            frontier[:, j, 0], frontier[:, j, 1] = size[labels] - contractors[labels], contractors[labels]
+            labels = parent[labels]
+        if remainder:
+            frontier = self._place_remainder(frontier, remainder, order, cap, headcount - max_contractors,
+                                             required_contractors, max_contractors, primary, weights)
+        frontier.setflags(write=False)
+        return list(frontier)
+
+    def _place_remainder(self, frontier: np.ndarray, remainder: int, order: List[int], cap: int, min_fte: int,
+                         min_contractor: int, max_contractors: int, primary: int, weights: Dict[str, float]) -> np.ndarray:
+        """Every way of adding the remainder to one (location, employment type) of each allocation, Pareto-filtered"""
+        candidates = []
+        for j in order:
+            for t in (0, 1):
+                extended = frontier.copy()
+                extended[:, j, t] += remainder
+                candidates.append(extended)
+        candidates = np.concatenate(candidates)
+        contractors = candidates[:, :, 1].sum(axis=1)
+        valid = ((candidates.sum(axis=2).max(axis=1) <= cap) & (candidates[:, :, 0].sum(axis=1) >= min_fte)
+                 & (contractors >= min_contractor) & (contractors <= max_contractors))
+        candidates = candidates[valid]
+        if len(candidates) == 0:
+            raise ValueError("No allocation satisfies these constraints; relax the country share, timezone or employment limits")
+        costs = (candidates * self.data_service.unit_cost_matrix[0]).sum(axis=(1, 2))
+        risks = self._risk_scores(candidates, primary, weights)
+        order = np.argsort(risks, kind="stable")
+        return candidates[order][self._pareto_mask(np.zeros(len(order), dtype=np.int64), costs[order], risks[order])]
+
+    def frontier(self, job_role, primary_location, headcount, constraint, employment_type, risk_weights=None,
+                 max_points: Optional[int] = None) -> Dict[str, Any]:
+        """The cost vs risk Pareto frontier, with the standard scenarios scored on the same risk scale
+
+        max_points thins the frontier to evenly spaced points, always keeping both ends.
+        """
+        if headcount <= 0:
+            raise ValueError("Headcount must be positive")
+        i, primary = self.data_service.cost_indices(job_role, primary_location)
+        limits, balanced_limits = self.scenario_limits(constraint, employment_type)
+        weights = self.resolve_risk_weights(risk_weights)
+        unit_costs = self.data_service.unit_cost_matrix[i]
+
+        frontier, resolution = self.frontier_counts(headcount, limits, employment_type, primary, weights)
+        size = len(frontier)
+        if max_points and size > max_points:
+            frontier = [frontier[k] for k in np.unique(np.linspace(0, size - 1, max_points).round().astype(int))]
+        pareto = ScenarioSet([(None, "Pareto-optimal mix", "Lowest cost for its risk level")] * len(frontier), headcount,
+                             np.stack(frontier), self.data_service.locations, unit_costs)
+        points = [dict(row, risk=self.allocation_risk(counts, primary, weights)) for row, counts in zip(pareto.rows(), frontier)]
+
+        counts = self.scenario_counts(primary, headcount, limits, balanced_limits, employment_type)
+        scenarios = {}
+        for k, (key, name, _) in enumerate(self.SCENARIOS):
+            scenarios[key] = {
+                "name": name,
+                "total_cost": float((counts[k] * unit_costs).sum()),
+                "risk": self.allocation_risk(counts[k], primary, weights)
             }
+        return {"frontier": points, "frontier_size": size, "scenarios": scenarios, "risk_weights": weights,
+                "resolution": resolution, "constraints": limits}
 
-            # Current scenario (all FTE in primary location)
-            fte_cost = self.calculate_fte_cost(job_role, primary_location, headcount)
-            scenarios["current"] = {
-                "name": "Current Strategy",
-                "allocation": [{
-                    "location": primary_location,
-                    "type": "FTE",
-                    "count": headcount,
-                    "unit_cost": fte_cost["total_cost"] / headcount,
-                    "total_cost": fte_cost["total_cost"]
-                }],
-                "total_cost": fte_cost["total_cost"],
-                "avg_cost_per_employee": fte_cost["total_cost"] / headcount,
-                "description": "Current baseline approach"
-            }
+    def min_cost_totals(self, unit_costs: np.ndarray, headcounts: np.ndarray, limits: Dict[str, Any], employment_type: str = 'both') -> np.ndarray:
+        """Cost of the solver's optimal allocation for every headcount at once (NaN if infeasible)
+
+        The allocation problem is a transportation LP with a totally unimodular constraint
+        matrix, so its optimum equals the LP dual. With an FTE price p and contractor price q
+        the dual is
+
+            D(p, q) = F*p + K*q + (H - F - K)*min(p, q) - C * sum_j max(0, p - fte_j, q - contractor_j)
+
+        which is concave and piecewise linear, so its maximum sits on a vertex of the kink
+        lines p = fte_j, q = contractor_j, p - q = fte_j - contractor_j and p = q. The
+        vertex set depends only on the unit costs, so every headcount is one row of a
+        (headcounts x vertices) array.
+        """
+        allowed_groups = limits["timezone_groups"]
+        allowed = [j for j, loc in enumerate(self.data_service.locations)
+                   if allowed_groups is None or loc.get("timezoneGroup") in allowed_groups]
+        fte = unit_costs[allowed, 0].astype(float)
+        contractor = unit_costs[allowed, 1].astype(float)
+
+        headcounts = np.asarray(headcounts, dtype=np.int64)
+        cap, min_fte, min_contractor = self._position_limits(headcounts, limits)
+        if employment_type == 'fte':
+            contractor = np.full_like(contractor, np.inf)
+            min_fte, min_contractor = headcounts, np.zeros_like(headcounts)
+        elif employment_type == 'contractor':
+            fte = np.full_like(fte, np.inf)
+            min_fte, min_contractor = np.zeros_like(headcounts), headcounts
+
+        finite_fte = fte[np.isfinite(fte)]
+        finite_contractor = contractor[np.isfinite(contractor)]
+        diagonals = np.append((fte - contractor)[np.isfinite(fte - contractor)], 0.0)
+        p = np.concatenate([np.repeat(finite_fte, len(finite_contractor)), np.repeat(finite_fte, len(diagonals)),
+                            (finite_contractor[:, None] + diagonals[None, :]).ravel()])
+        q = np.concatenate([np.tile(finite_contractor, len(finite_fte)), (finite_fte[:, None] - diagonals[None, :]).ravel(),
+                            np.repeat(finite_contractor, len(diagonals))])
+
+        with np.errstate(invalid="ignore"):
+            overflow = np.maximum(0.0, np.maximum(p[:, None] - fte[None, :], q[:, None] - contractor[None, :])).sum(axis=1)
+        free = headcounts - min_fte - min_contractor
+        dual = (np.outer(min_fte, p) + np.outer(min_contractor, q) + np.outer(free, np.minimum(p, q))
+                - np.outer(cap, overflow))
+        totals = dual.max(axis=1)
+        return np.where(cap * len(allowed) >= headcounts, totals, np.nan)
+
+    def sweep(self, job_role, primary_location, headcounts, constraint, employment_type) -> Dict[str, np.ndarray]:
+        """Scenario totals for a whole range of headcounts, as column arrays"""
+        headcounts = np.asarray(headcounts, dtype=np.int64)
+        if headcounts.size == 0 or headcounts.min() <= 0:
+            raise ValueError("Headcounts must be positive")
+        i, primary = self.data_service.cost_indices(job_role, primary_location)
+        limits, balanced_limits = self.scenario_limits(constraint, employment_type)
+        unit_costs = self.data_service.unit_cost_matrix[i]
+
+        columns = {
+            "headcount": headcounts,
+            "cost_effective": self.min_cost_totals(unit_costs, headcounts, limits, employment_type),
+            "balanced": self.min_cost_totals(unit_costs, headcounts, balanced_limits, employment_type),
+            "current": unit_costs[primary, 1 if employment_type == 'contractor' else 0] * headcounts
+        }
+        columns["savings"] = columns["current"] - columns["cost_effective"]
+        columns["savings_percentage"] = columns["savings"] / columns["current"] * 100
+        return columns
+
+    def generate_batch(self, lines: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Scenarios for a whole headcount plan, priced in one vectorized pass
+
+        Each line needs job_role, location and headcount, and may set employment_type
+        and constraint. Allocations are solved once per distinct (headcount, constraint)
+        and shared across roles; pricing is a single einsum over the cost matrix.
+        """
+        locations = self.data_service.locations
+        roles = np.empty(len(lines), dtype=np.int64)
+        counts = np.zeros((len(lines), len(self.SCENARIOS), len(locations), 2), dtype=np.int64)
+        parsed = []
+        for n, line in enumerate(lines):
+            try:
+                job_role, location = line.get('job_role'), line.get('location')
+                headcount = int(line.get('headcount', 1))
+                employment_type = line.get('employment_type') or 'both'
+                constraint = line.get('constraint') or 'balanced'
+                if headcount <= 0:
+                    raise ValueError("Headcount must be positive")
+                roles[n], primary = self.data_service.cost_indices(job_role, location)
+                limits, balanced_limits = self.scenario_limits(constraint, employment_type)
+                counts[n] = self.scenario_counts(primary, headcount, limits, balanced_limits, employment_type)
+            except (TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"line {n + 1}: {e}")
+            parsed.append((job_role, location, headcount, employment_type, constraint))
+
+        unit_costs = self.data_service.unit_cost_matrix[roles]
+        line_costs = counts * unit_costs[:, None, :, :]
+        totals = line_costs.sum(axis=(2, 3))
+        headcounts = counts[:, 0].sum(axis=(1, 2))
+
+        results = []
+        for n, (job_role, location, headcount, employment_type, constraint) in enumerate(parsed):
+            scenarios = ScenarioSet(self.SCENARIOS, headcount, counts[n], locations, unit_costs[n], line_costs[n])
+            results.append({
+                "job_role": job_role,
+                "location": location,
+                "headcount": headcount,
+                "employment_type": employment_type,
+                "constraint": constraint,
+                "scenarios": scenarios.to_dict(),
+                "savings": self._savings(float(totals[n, 2]), float(totals[n, 0]))
+            })
 
+        # Roles differ across lines, so the aggregate has line costs but no single unit cost
+        aggregate_totals = totals.sum(axis=0)
+        total_headcount = int(headcounts.sum())
+        aggregate = ScenarioSet(self.SCENARIOS, total_headcount, counts.sum(axis=0), locations, line_costs=line_costs.sum(axis=0))
+        aggregate = {"headcount": total_headcount, "scenarios": aggregate.to_dict(),
+                     "savings": self._savings(float(aggregate_totals[2]), float(aggregate_totals[0]))}
+
+        return {"lines": results, "aggregate": aggregate}
+
+    @staticmethod
+    def _savings(current_cost: float, optimized_cost: float) -> Dict[str, float]:
+        savings = current_cost - optimized_cost
+        return {
+            "absolute": savings,
+            "percentage": (savings / current_cost) * 100 if current_cost > 0 else 0,
+            "current_cost": current_cost,
+            "optimized_cost": optimized_cost
+        }
+
+def _simulate_chunk(args) -> np.ndarray:
+    """One reproducible block of Monte Carlo trials; module-level so a process pool can run it"""
+    seed, trials, fx_volatility, inflation, inflation_volatility, attrition, attrition_volatility, backfill_share, fte_costs, contractor_costs = args
+    rng = np.random.default_rng(seed)
+    locations = len(fx_volatility)
+
+    # Costs are quoted in USD: a local currency moving against the dollar scales them lognormally
+    fx = np.exp(rng.standard_normal((trials, locations)) * fx_volatility - 0.5 * fx_volatility ** 2)
+    wages = 1.0 + inflation + rng.standard_normal((trials, locations)) * inflation_volatility
+    leavers = np.clip(attrition + rng.standard_normal((trials, locations)) * attrition_volatility, 0.0, 1.0)
+
+    contractor_factor = fx * wages
+    # Backfilling an FTE leaver costs a share of a year's cost; contractor churn is the vendor's problem
+    fte_factor = contractor_factor * (1.0 + leavers * backfill_share)
+    return fte_factor @ fte_costs.T + contractor_factor @ contractor_costs.T
+
+
+class CostRiskSimulator:
+    """Monte Carlo cost-risk over FX moves, wage inflation and attrition for each scenario"""
+
+    BACKFILL_COST_SHARE = 0.3  # Recruiting and ramp-up cost of replacing a leaver, as a share of annual cost
+    CHUNK_TRIALS = 50000
+
+    def __init__(self, optimization_engine: OptimizationEngine, max_workers: Optional[int] = None):
+        self.optimization_engine = optimization_engine
+        self.data_service = optimization_engine.data_service
+        # Server-side ceiling on simulation processes per worker; a request's "workers" only asks for up to this many
+        self.max_workers = max_workers if max_workers is not None else int(os.environ.get("OPTIFORCE_SIMULATION_WORKERS", min(4, os.cpu_count() or 1)))
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        """One pool per process, created on first use and shared by every request"""
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def simulate(self, job_role, primary_location, headcount, constraint, employment_type,
+                 trials: int = 100000, seed: Optional[int] = None, workers: int = 1) -> Dict[str, Any]:
+        """P10/P50/P90 annual cost for each scenario of generate_scenarios
+
+        Trials are drawn in fixed-size chunks seeded from one SeedSequence, so a given seed
+        reproduces the same numbers whether the chunks run serially or on a process pool.
+        """
+        if headcount <= 0:
+            raise ValueError("Headcount must be positive")
+        if trials <= 0:
+            raise ValueError("Trials must be positive")
+        i, primary = self.data_service.cost_indices(job_role, primary_location)
+        limits, balanced_limits = self.optimization_engine.scenario_limits(constraint, employment_type)
+        counts = self.optimization_engine.scenario_counts(primary, headcount, limits, balanced_limits, employment_type)
+
+        # Scenario x location cost at today's rates, split by employment type
+        line_costs = counts * self.data_service.unit_cost_matrix[i][None, :, :]
+        risk = [self.data_service.risk_factors[loc["id"]] for loc in self.data_service.locations]
+        factors = [np.array([r[key] for r in risk]) for key in ("fxVolatility", "wageInflation", "wageInflationVolatility", "attrition", "attritionVolatility")]
+
+        seeds = np.random.SeedSequence(seed).spawn(math.ceil(trials / self.CHUNK_TRIALS))
+        chunks = [(child, min(self.CHUNK_TRIALS, trials - k * self.CHUNK_TRIALS), *factors, self.BACKFILL_COST_SHARE,
+                   line_costs[:, :, 0], line_costs[:, :, 1]) for k, child in enumerate(seeds)]
+        workers = min(workers, self.max_workers, os.cpu_count() or 1, len(chunks))
+        if workers > 1:
+            pool = self._process_pool()
+            try:
+                # A request never has more than ``workers`` chunks in the shared pool at once
+                totals = []
+                for start in range(0, len(chunks), workers):
+                    totals.extend(pool.map(_simulate_chunk, chunks[start:start + workers]))
+                totals = np.concatenate(totals)
+            except BrokenProcessPool:
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                raise
         else:
-            # All headcount is of the selected employment type
-            if employment_type == 'contractor':
-                total_cost = self.calculate_contractor_cost(job_role, primary_location, headcount)["total_cost"]
-                scenarios["cost_effective"] = {
-                    "name": "Most Cost-Effective Mix",
-                    "allocation": [{
-                        "location": primary_location,
-                        "type": "Contractor",
-                        "count": headcount,
-                        "unit_cost": total_cost / headcount,
-                        "total_cost": total_cost
-                    }],
-                    "total_cost": total_cost,
-                    "avg_cost_per_employee": total_cost / headcount,
-                    "description": "Optimized for maximum cost savings"
-                }
-                scenarios["balanced"] = scenarios["cost_effective"]
+            totals = np.concatenate([_simulate_chunk(chunk) for chunk in chunks])
+
+        p10, p50, p90 = np.percentile(totals, [10, 50, 90], axis=0)
+        results = {}
+        for k, (key, name, _) in enumerate(self.optimization_engine.SCENARIOS):
+            results[key] = {
+                "name": name,
+                "point_estimate": float(line_costs[k].sum()),
+                "mean": float(totals[:, k].mean()),
+                "p10": float(p10[k]),
+                "p50": float(p50[k]),
+                "p90": float(p90[k])
+            }
+        savings = totals[:, 2] - totals[:, 0]
+        return {
+            "scenarios": results,
+            "savings": {
+                "p10": float(np.percentile(savings, 10)),
+                "p50": float(np.percentile(savings, 50)),
+                "p90": float(np.percentile(savings, 90)),
+                "probability_positive": float((savings > 0).mean())
+            },
+            "trials": trials,
+            "seed": seed
+        }
+
+
+class WorkforceProjection:
+    """Month-by-month cost projection of a workforce plan over 1-5 years
+
+    Each plan line (role, location, employment type, target headcount) owns one row of a
+    lines x months cost grid. A row depends only on its own line settings, the annual raise
+    of its location and the cost data, so an edit recomputes just the rows it reaches and
+    patches the monthly totals by difference instead of rebuilding the whole horizon.
+    """
+
+    LINE_DEFAULTS = {"start_month": 0, "ramp_months": 0, "convert_month": None, "convert_share": 0.0}
+
+    def __init__(self, data_service: DataIngestionService, lines: List[Dict[str, Any]], horizon_years: int = 3,
+                 raises: Optional[Dict[str, float]] = None):
+        if not 1 <= int(horizon_years) <= 5:
+            raise ValueError("horizon_years must be between 1 and 5")
+        self.data_service = data_service
+        self.months = 12 * int(horizon_years)
+        self.raises = {loc_id: factors["wageInflation"] for loc_id, factors in data_service.risk_factors.items()}
+        self.raises.update({loc_id: float(rate) for loc_id, rate in (raises or {}).items()})
+        self.lines = {}
+        self.rows = {}
+        self.headcount_rows = {}
+        self.lines_by_location = {}
+        self.monthly_cost = np.zeros(self.months)
+        self.monthly_headcount = np.zeros(self.months)
+        self.revision = data_service.revision
+        self.last_recomputed = []
+        for line in lines:
+            line_id = line.get("id") or uuid.uuid4().hex[:8]
+            self._set_line(line_id, self._validated_line(line_id, line))
+        self._rebuild()
+
+    def _validated_line(self, line_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """The line ``changes`` would produce, checked and coerced without touching the plan"""
+        line = dict(self.lines.get(line_id) or self.LINE_DEFAULTS)
+        line.update({key: value for key, value in changes.items() if key != "id"})
+        line["role_index"], line["location_index"] = self.data_service.cost_indices(line.get("job_role"), line.get("location"))
+        if line.get("type") not in ("FTE", "Contractor"):
+            raise ValueError("Line type must be FTE or Contractor")
+        try:
+            line["headcount"] = int(line.get("headcount", 0))
+            line["start_month"] = int(line["start_month"])
+            line["ramp_months"] = int(line["ramp_months"])
+            line["convert_month"] = None if line["convert_month"] is None else int(line["convert_month"])
+            line["convert_share"] = float(line["convert_share"])
+        except (TypeError, ValueError):
+            raise ValueError(f"Line {line_id}: headcount and months must be integers and convert_share a number")
+        if line["headcount"] < 0:
+            raise ValueError("Headcount cannot be negative")
+        return line
+
+    def _set_line(self, line_id: str, line: Dict[str, Any]) -> None:
+        previous = self.lines.get(line_id)
+        if previous is not None:
+            self.lines_by_location[previous["location"]].discard(line_id)
+        self.lines[line_id] = line
+        self.lines_by_location.setdefault(line["location"], set()).add(line_id)
+
+    def update(self, lines: Optional[Dict[str, Dict[str, Any]]] = None, raises: Optional[Dict[str, float]] = None,
+               remove: Optional[List[str]] = None) -> List[str]:
+        """Apply edits and recompute only the affected rows; returns the recomputed line ids
+
+        Every edit is validated before any is applied, so a rejected PATCH leaves the plan unchanged.
+        """
+        changed = {line_id: self._validated_line(line_id, changes) for line_id, changes in (lines or {}).items()}
+        new_raises = {}
+        for location, rate in (raises or {}).items():
+            if location not in self.data_service.location_index:
+                raise ValueError("Invalid job role or location")
+            try:
+                new_raises[location] = float(rate)
+            except (TypeError, ValueError):
+                raise ValueError(f"Raise for {location} must be a number")
+
+        dirty = set(changed)
+        for line_id, line in changed.items():
+            self._set_line(line_id, line)
+        for location, rate in new_raises.items():
+            self.raises[location] = rate
+            dirty |= self.lines_by_location.get(location, set())
+        for line_id in remove or []:
+            if line_id in self.lines:
+                self._drop_row(line_id)
+                self.lines_by_location[self.lines[line_id]["location"]].discard(line_id)
+                del self.lines[line_id]
+                dirty.discard(line_id)
+        self._recompute(sorted(dirty))
+        return self.last_recomputed
+
+    def refresh(self) -> None:
+        """Rebuild every row if the underlying cost data changed since the last compute"""
+        if self.revision != self.data_service.revision:
+            self.revision = self.data_service.revision
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.rows, self.headcount_rows = {}, {}
+        self.monthly_cost = np.zeros(self.months)
+        self.monthly_headcount = np.zeros(self.months)
+        self._recompute(list(self.lines))
+
+    def _drop_row(self, line_id: str) -> None:
+        if line_id in self.rows:
+            self.monthly_cost -= self.rows.pop(line_id)
+            self.monthly_headcount -= self.headcount_rows.pop(line_id)
+
+    def _recompute(self, line_ids: List[str]) -> None:
+        month = np.arange(self.months)
+        for line_id in line_ids:
+            line = self.lines[line_id]
+            self._drop_row(line_id)
+
+            # Linear hiring ramp from start_month, reaching the target after ramp_months
+            ramp = max(line["ramp_months"], 1)
+            headcount = np.floor(line["headcount"] * np.clip((month - line["start_month"] + 1) / ramp, 0.0, 1.0))
+            # Raises land on each 12-month anniversary
+            raise_factor = (1.0 + self.raises.get(line["location"], 0.0)) ** (month // 12)
+            unit_costs = self.data_service.unit_cost_matrix[line["role_index"], line["location_index"]] / 12.0
+
+            if line["type"] == "FTE":
+                cost = headcount * unit_costs[0]
             else:
-                total_cost = self.calculate_fte_cost(job_role, primary_location, headcount)["total_cost"]
-                scenarios["cost_effective"] = {
-                    "name": "Most Cost-Effective Mix",
-                    "allocation": [{
-                        "location": primary_location,
-                        "type": "FTE",
-                        "count": headcount,
-                        "unit_cost": total_cost / headcount,
-                        "total_cost": total_cost
-                    }],
-                    "total_cost": total_cost,
-                    "avg_cost_per_employee": total_cost / headcount,
-                    "description": "Optimized for maximum cost savings"
-                }
-                scenarios["balanced"] = scenarios["cost_effective"]
-
-            # Current scenario same as cost-effective
-            scenarios["current"] = scenarios["cost_effective"]
+                converted = np.zeros(self.months)
+                if line["convert_month"] is not None:
+                    converted = np.where(month >= line["convert_month"], np.round(headcount * line["convert_share"]), 0.0)
+                cost = (headcount - converted) * unit_costs[1] + converted * unit_costs[0]
+            row = cost * raise_factor
+
+            self.rows[line_id] = row
+            self.headcount_rows[line_id] = headcount
+            self.monthly_cost += row
+            self.monthly_headcount += headcount
+        self.last_recomputed = list(line_ids)
+
+    def summary(self, line_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Totals plus per-line detail for ``line_ids`` (every line when None)"""
+        self.refresh()
+        selected = self.lines if line_ids is None else {line_id: self.lines[line_id] for line_id in line_ids if line_id in self.lines}
+        return {
+            "months": self.months,
+            "monthly_cost": self.monthly_cost.tolist(),
+            "monthly_headcount": self.monthly_headcount.astype(int).tolist(),
+            "annual_cost": self.monthly_cost.reshape(-1, 12).sum(axis=1).tolist(),
+            "total_cost": float(self.monthly_cost.sum()),
+            "raises": self.raises,
+            "lines": [{
+                "id": line_id,
+                "job_role": line["job_role"],
+                "location": line["location"],
+                "type": line["type"],
+                "headcount": line["headcount"],
+                "start_month": line["start_month"],
+                "ramp_months": line["ramp_months"],
+                "convert_month": line["convert_month"],
+                "convert_share": line["convert_share"],
+                "total_cost": float(self.rows[line_id].sum())
+            } for line_id, line in selected.items()],
+            "recomputed": self.last_recomputed
+        }
+
+    @classmethod
+    def from_scenario(cls, optimization_engine: OptimizationEngine, job_role, primary_location, headcount, constraint,
+                      employment_type, scenario: str = "cost_effective", **options) -> "WorkforceProjection":
+        """Seed a projection with the allocation of one generate_scenarios scenario"""
+        keys = [key for key, _, _ in optimization_engine.SCENARIOS]
+        if scenario not in keys:
+            raise ValueError(f"Unknown scenario: {scenario}")
+        if headcount <= 0:
+            raise ValueError("Headcount must be positive")
+        data_service = optimization_engine.data_service
+        i, primary = data_service.cost_indices(job_role, primary_location)
+        limits, balanced_limits = optimization_engine.scenario_limits(constraint, employment_type)
+        counts = optimization_engine.scenario_counts(primary, headcount, limits, balanced_limits, employment_type)[keys.index(scenario)]
+        lines = [{
+            "id": f"{data_service.locations[j]['id']}-{'fte' if t == 0 else 'contractor'}",
+            "job_role": job_role,
+            "location": data_service.locations[j]["id"],
+            "type": "FTE" if t == 0 else "Contractor",
+            "headcount": count
+        } for j, t, count in optimization_engine._allocation_lines(counts, data_service.unit_cost_matrix[i])]
+        return cls(data_service, lines, **options)
 
-        return scenarios
 
 # ============================================================================
 # PHASE 3: AI EXPLANATION LAYER (Lightweight LLM Simulation)
@@ -564,133 +1738,1946 @@ class LightweightLLMService:
 
         return comparisons.get(key) or comparisons.get(reverse_key) or f"Geographic arbitrage between {location1} and {location2} provides strategic cost optimization opportunities."
 '''
-class LightweightLLMService:
-    """Real lightweight LLM integration using Phi-3 with Windows support"""
-    
-    def __init__(self):
-        # Disable timeout signals (not supported on Windows)
-        os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-        os.environ["HF_HUB_DISABLE_EXPERIMENTAL_WARNING"] = "1"
-        
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            "microsoft/Phi-3-mini-4k-instruct",
-            trust_remote_code=True
-        )
-        self.model = AutoModelForCausalLM.from_pretrained(
-            "microsoft/Phi-3-mini-4k-instruct",
-            torch_dtype=torch.float16,
-            trust_remote_code=True,
-            attn_implementation="flash_attention_2" 
+def _load_torch_model(model_id: str):
+    """PyTorch backend: float32 on CPU (float16 when a GPU is present)"""
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    model = AutoModelForCausalLM.from_pretrained(
+        model_id,
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+        trust_remote_code=True
+    )
+    return model.eval()
 
-        )
+def _load_torch_int8_model(model_id: str):
+    """PyTorch backend with every nn.Linear dynamically quantized to int8 (CPU only)"""
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch.float32, trust_remote_code=True)
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_onnx_model(model_id: str):
+    """ONNX Runtime backend; exports the checkpoint on first load (needs optimum[onnxruntime])"""
+    from optimum.onnxruntime import ORTModelForCausalLM
+
+    return ORTModelForCausalLM.from_pretrained(model_id, export=True, use_cache=True)
+
+INFERENCE_BACKENDS = {
+    "torch": _load_torch_model,
+    "torch-int8": _load_torch_int8_model,
+    "onnx": _load_onnx_model
+}
+
+def _torch_precision() -> str:
+    try:
+        import torch
+    except ImportError:
+        return "float32"
+    return "float16" if torch.cuda.is_available() else "float32"
+
+# Numeric precision each backend generates at; part of the explanation cache key
+INFERENCE_PRECISIONS = {
+    "torch": _torch_precision,
+    "torch-int8": lambda: "qint8",
+    "onnx": lambda: "float32"
+}
+
+
+class ModelManager:
+    """Owns the Phi-3 model lifecycle: loads it once per process, off the request path"""
+
+    IDLE = "idle"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+    DISABLED = "disabled"
+
+    def __init__(self, model_id: Optional[str] = None, load_mode: Optional[str] = None, backend: Optional[str] = None):
+        self.model_id = model_id or os.environ.get("OPTIFORCE_MODEL_ID", "microsoft/Phi-3-mini-4k-instruct")
+        self.backend = (backend or os.environ.get("OPTIFORCE_INFERENCE_BACKEND", "torch")).lower()
+        if self.backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend {self.backend!r}; choose one of {', '.join(INFERENCE_BACKENDS)}")
+        # "background" starts loading as soon as the worker is up, "lazy" on the first
+        # explanation or readiness request, "off" never loads and always serves the fallback text
+        self.load_mode = (load_mode or os.environ.get("OPTIFORCE_MODEL_LOAD", "background")).lower()
+        self._precision = None
+        self.tokenizer = None
+        self.model = None
+        self.state = self.DISABLED if self.load_mode == "off" else self.IDLE
+        self.error = None
+        self.load_seconds = None
+        self.memory_bytes = None
+        self._lock = threading.Lock()
+        self._ready_event = threading.Event()
+        self._pid = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == self.READY
+
+    def start(self) -> None:
+        """Kick off a background load if one is not already running in this process"""
+        with self._lock:
+            # A thread started before a gunicorn --preload fork does not exist in the worker
+            if self._pid is not None and self._pid != os.getpid() and self.state == self.LOADING:
+                self.state = self.IDLE
+            if self.state != self.IDLE:
+                return
+            self.state = self.LOADING
+            self._pid = os.getpid()
+        threading.Thread(target=self._load, name="optiforce-model-loader", daemon=True).start()
+
+    def _load(self) -> None:
+        started = time.time()
         try:
-            self.model = AutoModelForCausalLM.from_pretrained(
-            "microsoft/Phi-3-mini-4k-instruct",
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-            trust_remote_code=True
-    )
+            # Heavy imports stay here so importing the app never pays for them
+            from transformers import AutoTokenizer
+
+            os.environ.setdefault("HF_HUB_DISABLE_SYMLINKS_WARNING", "1")
+            os.environ.setdefault("HF_HUB_DISABLE_EXPERIMENTAL_WARNING", "1")
+
+            tokenizer = AutoTokenizer.from_pretrained(self.model_id, trust_remote_code=True)
+            # Batched generation pads on the left so every prompt ends where decoding starts
+            tokenizer.padding_side = "left"
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            model = INFERENCE_BACKENDS[self.backend](self.model_id)
+
+            self.tokenizer, self.model = tokenizer, model
+            self.memory_bytes = self._memory_bytes(model)
+            self.load_seconds = time.time() - started
+            self.state = self.READY
         except Exception as e:
             print(f"Model loading failed: {str(e)}")
-            self.model = None  # Fallback to template-based responses
+            self.error = str(e)
+            self.state = self.FAILED
+        finally:
+            self._ready_event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the load finishes (successfully or not); returns readiness"""
+        if self.state in (self.IDLE, self.DISABLED):
+            return self.ready
+        self._ready_event.wait(timeout)
+        return self.ready
+
+    @property
+    def precision(self) -> str:
+        """Weights' numeric format under this backend (float32, float16 or qint8)"""
+        if self._precision is None:
+            self._precision = INFERENCE_PRECISIONS[self.backend]()
+        return self._precision
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "model_id": self.model_id,
+            "backend": self.backend,
+            "precision": self.precision,
+            "load_mode": self.load_mode,
+            "state": self.state,
+            "ready": self.ready,
+            "load_seconds": self.load_seconds,
+            "memory_bytes": self.memory_bytes,
+            "error": self.error
+        }
 
-        # Apply 4-bit quantization if possible
-        if not torch.cuda.is_available():
-            self.model = self.model.to(torch.float32)
-        else:
-            self.model = self.model.to(torch.float16)
+    @staticmethod
+    def _memory_bytes(model) -> Optional[int]:
+        """Bytes held by the model's weights and buffers (None for backends that don't expose them)"""
+        if not hasattr(model, "parameters"):
+            return None
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class PromptPrefixCache:
+    """Past key/values of the prompt preamble every explanation shares, prefilled once per loaded model
+
+    Generation then starts from a view of that cached state, so only each prompt's
+    variable suffix is prefilled. In a batch the suffixes are left-padded after the
+    shared prefix ([prefix][pad][suffix]); position ids follow the attention mask, so
+    greedy decoding yields the same tokens as the uncached path. A prompt whose tokens
+    don't begin with the prefix tokens, and the ONNX backend, take the ordinary path.
+    """
+
+    SUPPORTED_BACKENDS = ("torch", "torch-int8")
+
+    def __init__(self, model_manager: ModelManager, prefix: str, enabled: Optional[bool] = None):
+        self.model_manager = model_manager
+        self.prefix = prefix
+        self.enabled = enabled if enabled is not None else os.environ.get("OPTIFORCE_PREFIX_CACHE", "1") != "0"
+        self._lock = threading.Lock()
+        self._model = None
+        self._prefix_ids = None
+        self._past = None
+        self.hits = 0
+        self.misses = 0
+        self.prefill_seconds = None
+
+    def _state(self):
+        """(prefix token ids, past key/values) for the loaded model, computed on first use"""
+        model = self.model_manager.model
+        with self._lock:
+            if self._model is not model:
+                import torch
+
+                started = time.perf_counter()
+                prefix_ids = self.model_manager.tokenizer(self.prefix, return_tensors="pt")["input_ids"].to(model.device)
+                with torch.no_grad():
+                    self._past = model(input_ids=prefix_ids, use_cache=True).past_key_values
+                self._prefix_ids = prefix_ids[0].tolist()
+                self._model = model
+                self.prefill_seconds = time.perf_counter() - started
+            return self._prefix_ids, self._past
+
+    def _expanded_past(self, batch_size: int):
+        """A fresh cache holding batch_size views of the prefix state (decoding appends to it, never in place)"""
+        if hasattr(self._past, "to_legacy_cache"):
+            layers = self._past.to_legacy_cache()
+            return type(self._past).from_legacy_cache(tuple(tuple(t.expand(batch_size, *t.shape[1:]) for t in layer) for layer in layers))
+        return tuple(tuple(t.expand(batch_size, *t.shape[1:]) for t in layer) for layer in self._past)
+
+    def generation_inputs(self, prompts: List[str]) -> Optional[Dict[str, Any]]:
+        """generate() keyword arguments starting from the cached prefix, or None to use the ordinary path"""
+        if not self.enabled or self.model_manager.backend not in self.SUPPORTED_BACKENDS:
+            return None
+        import torch
+
+        prefix_ids, _ = self._state()
+        tokenizer = self.model_manager.tokenizer
+        size = len(prefix_ids)
+        suffixes = []
+        for prompt in prompts:
+            ids = tokenizer(prompt)["input_ids"]
+            if ids[:size] != prefix_ids or len(ids) == size:
+                self.misses += 1
+                return None
+            suffixes.append(ids[size:])
+
+        width = max(len(suffix) for suffix in suffixes)
+        input_ids = [prefix_ids + [tokenizer.pad_token_id] * (width - len(suffix)) + suffix for suffix in suffixes]
+        attention_mask = [[1] * size + [0] * (width - len(suffix)) + [1] * len(suffix) for suffix in suffixes]
+        self.hits += len(prompts)
+        device = self.model_manager.model.device
+        return {
+            "input_ids": torch.tensor(input_ids, device=device),
+            "attention_mask": torch.tensor(attention_mask, device=device),
+            "past_key_values": self._expanded_past(len(prompts))
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "prefix_tokens": len(self._prefix_ids) if self._prefix_ids is not None else None,
+            "prefill_seconds": self.prefill_seconds,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class BatchScheduler:
+    """Collects concurrent explanation prompts into padded micro-batches for a single generate() call
+
+    The first queued prompt opens a window of ``max_wait_ms``; everything that arrives
+    before it closes (up to ``max_batch_size`` prompts) is generated together and each
+    caller gets back only its own decoded continuation.
+    """
+
+    def __init__(self, model_manager: ModelManager, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None,
+                 prefix_cache: Optional[PromptPrefixCache] = None):
+        self.model_manager = model_manager
+        self.prefix_cache = prefix_cache
+        self.max_batch_size = max_batch_size or int(os.environ.get("OPTIFORCE_BATCH_MAX_SIZE", 8))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else float(os.environ.get("OPTIFORCE_BATCH_MAX_WAIT_MS", 10))) / 1000.0
+        # Past this many waiting prompts new ones are turned away instead of piling up behind the model
+        self.max_queue_size = int(os.environ.get("OPTIFORCE_BATCH_MAX_QUEUE", 64))
+        # Greedy decoding makes a prompt's output reproducible, which is what lets
+        # ExplanationCache hand back the same text a fresh call would produce
+        self.deterministic = os.environ.get("OPTIFORCE_DETERMINISTIC_DECODING", "1") != "0"
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches_run = 0
+        self.requests_served = 0
+        self.max_queue_depth = 0
+        self.last_batch_size = 0
+        self.rejected = 0
+
+    def enqueue(self, prompt: str, max_new_tokens: int = 200) -> Future:
+        """Queue a prompt; the returned future resolves once its batch has been generated
+
+        Raises queue.Full when ``max_queue_size`` prompts are already waiting.
+        """
+        self._ensure_thread()
+        future = Future()
+        try:
+            self._queue.put_nowait((prompt, max_new_tokens, future))
+        except queue.Full:
+            self.rejected += 1
+            raise
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def submit(self, prompt: str, max_new_tokens: int = 200, timeout: Optional[float] = None) -> str:
+        """Queue a prompt and block until its batch has been generated"""
+        return self.enqueue(prompt, max_new_tokens).result(timeout)
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="optiforce-batcher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[str, int, Future]]) -> None:
+        try:
+            texts = self.generate_batch([prompt for prompt, _, _ in batch], [limit for _, limit, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches_run += 1
+        self.requests_served += len(batch)
+        self.last_batch_size = len(batch)
+        for (_, _, future), text in zip(batch, texts):
+            future.set_result(text)
+
+    def generate_batch(self, prompts: List[str], max_new_tokens: List[int]) -> List[str]:
+        """Pad ``prompts`` into one generate() call and decode each continuation separately"""
+        tokenizer = self.model_manager.tokenizer
+        model = self.model_manager.model
+
+        with metrics.stage("tokenize"):
+            inputs = self.generation_inputs(prompts)
+        started = time.perf_counter()
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max(max_new_tokens),
+            pad_token_id=tokenizer.pad_token_id,
+            **self.decoding_kwargs()
+        )
+        generate_seconds = time.perf_counter() - started
+
+        with metrics.stage("decode"):
+            new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+            texts = [tokenizer.decode(tokens[:limit], skip_special_tokens=True) for tokens, limit in zip(new_tokens, max_new_tokens)]
+        # Finished rows are padded out to the longest, so count each one up to its first pad/EOS token
+        finished = (new_tokens == tokenizer.pad_token_id) | (new_tokens == tokenizer.eos_token_id)
+        lengths = [min(limit, int(row.nonzero()[0]) if row.any() else len(row)) for row, limit in zip(finished, max_new_tokens)]
+        metrics.observe("optiforce_stage_seconds", generate_seconds, stage="generate")
+        metrics.observe("optiforce_batch_size", len(prompts))
+        for length in lengths:
+            metrics.observe("optiforce_generated_tokens", length)
+        if generate_seconds > 0:
+            metrics.observe("optiforce_generation_tokens_per_second", sum(lengths) / generate_seconds)
+        return texts
+
+    def generation_inputs(self, prompts: List[str]) -> Dict[str, Any]:
+        """Tokenized prompts for generate(), starting from the cached prompt prefix when possible"""
+        inputs = self.prefix_cache.generation_inputs(prompts) if self.prefix_cache is not None else None
+        if inputs is None:
+            inputs = self.model_manager.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model_manager.model.device)
+        return inputs
+
+    def decoding_kwargs(self) -> Dict[str, Any]:
+        return {"do_sample": False} if self.deterministic else {"do_sample": True, "temperature": 0.7}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "deterministic": self.deterministic,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "max_queue_size": self.max_queue_size,
+            "rejected": self.rejected,
+            "batches_run": self.batches_run,
+            "requests_served": self.requests_served,
+            "avg_batch_size": self.requests_served / self.batches_run if self.batches_run else 0.0,
+            "last_batch_size": self.last_batch_size
+        }
+
+
+class ExplanationCache:
+    """Content-addressed cache of generated explanations
+
+    Keys are a SHA-256 of the whitespace-normalized prompt plus everything else that
+    changes the output (model, decoding mode, token limit). A bounded in-memory LRU
+    sits in front of an optional SQLite tier that survives restarts and is shared by
+    every worker on the box.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, db_path: Optional[str] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get("OPTIFORCE_EXPLANATION_CACHE_SIZE", 1024))
+        self.db_path = db_path if db_path is not None else os.environ.get("OPTIFORCE_EXPLANATION_CACHE_DB")
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.db_path:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS explanations (key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(prompt: str, *variant: Any) -> str:
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(json.dumps([normalized, *variant]).encode()).hexdigest()
+
+    def get(self, key: str, record: bool = True) -> Optional[str]:
+        """Cached text for key, or None; record=False leaves the hit/miss counters alone"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += record
+                return text
+            if self._db is not None:
+                row = self._db.execute("SELECT text FROM explanations WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.hits += record
+                    self.disk_hits += record
+                    return row[0]
+            self.misses += record
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            self._remember(key, text)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO explanations (key, text, created) VALUES (?, ?, ?)", (key, text, time.time()))
+                self._db.commit()
+
+    def _remember(self, key: str, text: str) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_tier": self.db_path,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class InferenceClient:
+    """Thin client for inference_server.py, which owns the single shared model copy
+
+    ``url`` is either ``http://host:port`` or ``unix:/path/to/socket``.
+    """
+
+    def __init__(self, url: str, timeout: Optional[float] = None):
+        self.url = url
+        self.timeout = timeout if timeout is not None else float(os.environ.get("OPTIFORCE_INFERENCE_TIMEOUT", 120))
+
+    def _connection(self, timeout: Optional[float] = None):
+        timeout = self.timeout if timeout is None else timeout
+        if self.url.startswith("unix:"):
+            return _UnixHTTPConnection(self.url[len("unix:"):], timeout=timeout)
+        parsed = urllib.parse.urlsplit(self.url)
+        return http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        conn = self._connection(timeout)
+        try:
+            body = json.dumps(payload) if payload is not None else None
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise ValueError(data.get("error") or f"inference server returned HTTP {response.status}")
+        return data
+
+    def generate(self, prompt: str, max_new_tokens: int = 200, timeout: Optional[float] = None) -> str:
+        return self._request("POST", "/generate", {"prompt": prompt, "max_new_tokens": max_new_tokens}, timeout)["text"]
+
+    def status(self) -> Dict[str, Any]:
+        conn = self._connection()
+        try:
+            conn.request("GET", "/readyz")
+            response = conn.getresponse()
+            data = json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+        data["inference_url"] = self.url
+        return data
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a local Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class StreamsBusy(Exception):
+    pass
+
+class ExplanationStream:
+    """Iterator over explanation pieces; closing it, or a failure while reading, cancels the generation behind it"""
+
+    def __init__(self, pieces, cancelled: Optional[threading.Event] = None):
+        self._pieces = pieces
+        self._cancelled = cancelled
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
         try:
-            self.model = self.model.quantize(4)  # 4-bit quantization
-        except:
-            pass  # Skip if quantization fails
+            return next(self._pieces)
+        except StopIteration:
+            raise
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._cancelled is not None:
+            self._cancelled.set()
+        close = getattr(self._pieces, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                pass  # still running on another thread; the cancel flag ends it at the next token
+
+
+class LightweightLLMService:
+    """Real lightweight LLM integration using Phi-3, with a template fallback while the model warms up"""
+
+    def __init__(self, model_manager: ModelManager, inference_client: Optional["InferenceClient"] = None):
+        self.model_manager = model_manager
+        # When set, generation is delegated to a shared inference server and the
+        # local model manager is never started
+        self.inference_client = inference_client
+        self.cache = ExplanationCache()
         self.system_prompt = """You are an AI workforce optimization analyst. Provide concise, professional explanations of cost savings based on the following data:"""
-    
-    def generate_explanation(self, scenarios, job_role):
+        # Every prompt starts with this preamble, so its key/values are prefilled once and reused
+        self.prompt_prefix = f"""
+        {self.system_prompt}
+        - Job role:"""
+        self.prefix_cache = PromptPrefixCache(model_manager, self.prompt_prefix)
+        self.batcher = BatchScheduler(model_manager, prefix_cache=self.prefix_cache)
+        # Longest a stream waits for its next token before giving up with an error event
+        self.stream_token_timeout = float(os.environ.get("OPTIFORCE_STREAM_TOKEN_TIMEOUT_SECONDS", 60))
+        # Streams call generate() on their own threads, outside the batcher, so their number is capped here
+        self.max_streams = int(os.environ.get("OPTIFORCE_MAX_STREAMS", self.batcher.max_batch_size))
+        self.stream_slots = threading.BoundedSemaphore(self.max_streams)
+
+    def build_prompt(self, scenarios, job_role):
         current = scenarios["current"]
         cost_effective = scenarios["cost_effective"]
-        
+
         savings = current["total_cost"] - cost_effective["total_cost"]
-        savings_pct = (savings / current["total_cost"]) * 100
-        
-        # Prepare LLM prompt
-        prompt = f"""
-        {self.system_prompt}
-        - Job role: {job_role}
+        savings_pct = (savings / current["total_cost"]) * 100 if current["total_cost"] else 0
+
+        return f"""{self.prompt_prefix} {job_role}
         - Current strategy cost: ${current['total_cost']:,.0f}
         - Optimized strategy cost: ${cost_effective['total_cost']:,.0f}
         - Savings: ${savings:,.0f} ({savings_pct:.1f}%)
         - Optimization strategy: {cost_effective['description']}
         """
-        
-        # Generate response
-        inputs = self.tokenizer(prompt, return_tensors="pt")
-        outputs = self.model.generate(
-            **inputs,
-            max_new_tokens=200,
-            temperature=0.7,
-            do_sample=True,
-            attn_implementation='eager'
-        )
-        
-        return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+    def fallback_explanation(self, scenarios, job_role):
+        """Deterministic template explanation used until the model is ready"""
+        current = scenarios["current"]
+        cost_effective = scenarios["cost_effective"]
+
+        savings = current["total_cost"] - cost_effective["total_cost"]
+        savings_pct = (savings / current["total_cost"]) * 100 if current["total_cost"] else 0
+
+        if savings <= 0:
+            return "Your current strategy is already well-optimized for cost efficiency. Consider exploring balanced approaches for enhanced operational flexibility."
+
+        explanation = f"OptiForce AI Analysis: Your optimized workforce strategy saves ${savings:,.0f} ({savings_pct:.1f}%) compared to your current approach."
+
+        primary_location = cost_effective["allocation"][0]["location"]
+        current_location = current["allocation"][0]["location"]
+        if primary_location != current_location:
+            explanation += f" Key insight: Leveraging {primary_location}'s lower cost index, social charges and benefits overhead drives most of the savings."
+
+        contractor_allocation = next((alloc for alloc in cost_effective["allocation"] if alloc["type"] == "Contractor"), None)
+        if contractor_allocation:
+            explanation += f" Strategic contractor utilization ({contractor_allocation['count']} contractors) eliminates benefits overhead while maintaining operational flexibility."
+
+        explanation += " Risk mitigation: The recommended mix balances cost optimization with talent quality and operational stability."
+        return explanation
+
+    def _cache_key(self, prompt: str, max_new_tokens: int) -> str:
+        if self.inference_client is not None:
+            return ExplanationCache.make_key(prompt, self.inference_client.url, max_new_tokens)
+        # Quantized and float32 runs of one checkpoint decode differently, so they never share entries
+        manager = self.model_manager
+        return ExplanationCache.make_key(prompt, manager.model_id, manager.backend, manager.precision, self.batcher.deterministic, max_new_tokens)
+
+    def _local_model_ready(self) -> bool:
+        if self.model_manager.load_mode == "lazy":
+            self.model_manager.start()
+        return self.model_manager.ready
+
+    def generate_text(self, prompt: str, max_new_tokens: int = 200) -> Optional[str]:
+        """Run the model on a prompt; returns None when no model is available to answer"""
+        return self._generate(prompt, max_new_tokens)[0]
+
+    def _generate(self, prompt: str, max_new_tokens: int, timeout: Optional[float] = None) -> Tuple[Optional[str], str]:
+        """Returns (text, source) where source is "cache", "llm" or "unavailable"
+
+        With a ``timeout`` the caller stops waiting after that many seconds; a local
+        generation keeps running and still lands in the cache for the next request.
+        """
+        key = self._cache_key(prompt, max_new_tokens)
+        text = self.cache.get(key)
+        if text is not None:
+            return text, "cache"
+
+        # No time left to wait: answer from the template rather than queue work nobody will read
+        if timeout is not None and timeout <= 0:
+            return None, "unavailable"
+        if self.inference_client is not None:
+            try:
+                text = self.inference_client.generate(prompt, max_new_tokens, timeout)
+            except (OSError, ValueError) as e:
+                print(f"Inference server request failed: {str(e)}")
+                return None, "unavailable"
+        else:
+            if not self._local_model_ready():
+                return None, "unavailable"
+            try:
+                future = self.batcher.enqueue(prompt, max_new_tokens)
+            except queue.Full:
+                return None, "unavailable"
+            try:
+                text = future.result(timeout)
+            except FutureTimeoutError:
+                future.add_done_callback(lambda done: done.exception() is None and self.cache.put(key, done.result()))
+                return None, "unavailable"
+
+        self.cache.put(key, text)
+        return text, "llm"
+
+    def generate_explanation(self, scenarios, job_role):
+        return self.explain(scenarios, job_role)[0]
+
+    def explain(self, scenarios, job_role, timeout: Optional[float] = None) -> Tuple[str, str]:
+        """Explanation plus where it came from: "llm", "cache" or "template" """
+        text, source = self._generate(self.build_prompt(scenarios, job_role), 200, timeout)
+        if text is None:
+            text, source = self.fallback_explanation(scenarios, job_role), "template"
+        metrics.inc("optiforce_explanations_total", source=source)
+        return text, source
+
+    def stream_explanation(self, scenarios, job_role, max_new_tokens: int = 200) -> "ExplanationStream":
+        """Pieces of the explanation as the local model decodes them
+
+        Cache hits, the shared inference server and the template fallback have
+        nothing to stream, so they yield the whole text at once. A local generation
+        takes one of ``max_streams`` slots up front and raises StreamsBusy when none
+        is free; closing the stream stops the generation.
+        """
+        prompt = self.build_prompt(scenarios, job_role)
+        if self.inference_client is not None or not self._local_model_ready():
+            def whole():
+                text = self.generate_text(prompt, max_new_tokens)
+                yield text if text is not None else self.fallback_explanation(scenarios, job_role)
+            return ExplanationStream(whole())
+
+        key = self._cache_key(prompt, max_new_tokens)
+        text = self.cache.get(key)
+        if text is not None:
+            return ExplanationStream(iter([text]))
+
+        if not self.stream_slots.acquire(blocking=False):
+            raise StreamsBusy(f"All {self.max_streams} explanation streams are busy; try again later")
+        try:
+            from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+            tokenizer = self.model_manager.tokenizer
+            model = self.model_manager.model
+            streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=self.stream_token_timeout)
+            inputs = self.batcher.generation_inputs([prompt])
+        except BaseException:
+            self.stream_slots.release()
+            raise
+        cancelled = threading.Event()
+        failure = []
+
+        class Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                import torch
+                return torch.full((input_ids.shape[0],), cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        def generate():
+            try:
+                model.generate(**inputs, streamer=streamer, max_new_tokens=max_new_tokens,
+                               stopping_criteria=StoppingCriteriaList([Cancelled()]),
+                               pad_token_id=tokenizer.pad_token_id, **self.batcher.decoding_kwargs())
+            except Exception as e:
+                failure.append(e)
+                streamer.end()  # unblocks the reader, which re-raises below
+            finally:
+                self.stream_slots.release()
+
+        worker = threading.Thread(target=generate, name="optiforce-stream", daemon=True)
+        worker.start()
+
+        def pieces():
+            decoded = []
+            try:
+                for piece in streamer:
+                    if piece:
+                        decoded.append(piece)
+                        yield piece
+            except queue.Empty:
+                raise TimeoutError(f"No token from the model within {self.stream_token_timeout:g}s")
+            worker.join()
+            if failure:
+                raise RuntimeError(f"Generation failed: {failure[0]}")
+            if not cancelled.is_set():
+                self.cache.put(key, "".join(decoded))
+
+        return ExplanationStream(pieces(), cancelled)
+
+    def status(self) -> Dict[str, Any]:
+        if self.inference_client is not None:
+            try:
+                status = self.inference_client.status()
+            except (OSError, ValueError) as e:
+                status = {"state": ModelManager.FAILED, "ready": False, "error": str(e), "inference_url": self.inference_client.url}
+        else:
+            status = self.model_manager.status()
+            status["batching"] = self.batcher.stats()
+            status["prefix_cache"] = self.prefix_cache.stats()
+        status["cache"] = self.cache.stats()
+        return status
+
+
+class LocationComparisonIndex:
+    """Every location pair x role x employment type, compared component by component
+
+    Built from the cost matrix in one vectorized pass and rebuilt when the cost data
+    revision changes, so a comparison is a dictionary lookup. Percentage gaps don't
+    depend on the role (every cost is linear in salary), so the prose is written once
+    per location pair: an LLM write-up when one was generated offline (flask
+    build-comparisons) and is in the explanation cache, else a template.
+    """
+
+    COMPONENTS = ("salary", "social_charges", "benefits", "contractor_premium")
+    MAX_NEW_TOKENS = 120
+
+    def __init__(self, data_service: DataIngestionService, llm_service: LightweightLLMService):
+        self.data_service = data_service
+        self.llm_service = llm_service
+        self.revision = None
+        self._lock = threading.Lock()
+        self.build()
+
+    def build(self) -> None:
+        data = self.data_service
+        cost = data.cost_matrix
+        # roles x locations x employment type x component, per employee per year
+        components = np.zeros(cost.shape[:3] + (len(self.COMPONENTS),))
+        components[:, :, 0, :3] = cost[:, :, 0]
+        components[:, :, 1, 0] = cost[:, :, 0, 0]  # a contractor's rate is the FTE salary plus the premium on it
+        components[:, :, 1, 1:3] = cost[:, :, 1, 1:3]
+        components[:, :, 1, 3] = cost[:, :, 1, 0] - cost[:, :, 0, 0]
+        totals = components.sum(axis=-1)
+        deltas = components[:, :, None] - components[:, None, :]
+
+        roles, locations = [job["id"] for job in data.job_roles], [loc["id"] for loc in data.locations]
+        prose = {(a, b): self.pair_explanation(j, k, totals[0]) for j, a in enumerate(locations) for k, b in enumerate(locations)}
+        totals, deltas = totals.tolist(), deltas.tolist()
+        entries = {}
+        for i, role in enumerate(roles):
+            for j, first in enumerate(locations):
+                for k, second in enumerate(locations):
+                    entry = {"job_role": role, "location1": first, "location2": second}
+                    for t, employment_type in enumerate(data.EMPLOYMENT_TYPES):
+                        first_cost, second_cost = totals[i][j][t], totals[i][k][t]
+                        entry[employment_type] = {
+                            "location1_cost": first_cost,
+                            "location2_cost": second_cost,
+                            "difference": first_cost - second_cost,
+                            "difference_pct": (first_cost - second_cost) / second_cost * 100 if second_cost else 0.0,
+                            "components": dict(zip(self.COMPONENTS, deltas[i][j][k][t]))
+                        }
+                    entry["explanation"], entry["explanation_source"] = prose[first, second]
+                    entries[role, first, second] = entry
+
+        # Requests may name roles and locations by id or display name, in any case
+        aliases = {}
+        for items in (data.job_roles, data.locations):
+            for item in items:
+                aliases[item["id"].lower()] = aliases[item["name"].lower()] = item["id"]
+        self.__dict__.update(entries=entries, aliases=aliases, revision=data.revision)
+
+    def pair_prompt(self, j: int, k: int, unit_costs: np.ndarray) -> str:
+        first, second = self.data_service.locations[j], self.data_service.locations[k]
+        fte_pct, contractor_pct = (unit_costs[j] - unit_costs[k]) / unit_costs[k] * 100
+        return f"""{self.llm_service.system_prompt}
+        - Location: {first['name']} compared with {second['name']}
+        - Full-time cost per employee: {fte_pct:+.1f}%
+        - Contractor cost per employee: {contractor_pct:+.1f}%
+        - Salary level: {first['costIndex']:.2f} vs {second['costIndex']:.2f} (cost index)
+        - Social charges: {first['socialCharges']:.0%} vs {second['socialCharges']:.0%} of salary
+        - Benefits: {first['benefits']:.0%} vs {second['benefits']:.0%} of salary
+        - Contractor premium: {first['contractorPremium']:.1f}x vs {second['contractorPremium']:.1f}x salary
+        """
+
+    def pair_explanation(self, j: int, k: int, unit_costs: np.ndarray) -> Tuple[str, str]:
+        """(text, source) for a location pair: cached LLM prose when there is some, else the template"""
+        if j != k:
+            key = self.llm_service._cache_key(self.pair_prompt(j, k, unit_costs), self.MAX_NEW_TOKENS)
+            text = self.llm_service.cache.get(key, record=False)
+            if text is not None:
+                return text, "llm"
+
+        first, second = self.data_service.locations[j], self.data_service.locations[k]
+        fte_pct, contractor_pct = (unit_costs[j] - unit_costs[k]) / unit_costs[k] * 100
+        if abs(fte_pct) < 0.05:
+            return f"{first['name']} and {second['name']} cost the same per full-time employee.", "template"
+        direction = "less" if fte_pct < 0 else "more"
+        drivers = [("salary levels", first["costIndex"], second["costIndex"]),
+                   ("social charges", first["costIndex"] * first["socialCharges"], second["costIndex"] * second["socialCharges"]),
+                   ("benefits", first["costIndex"] * first["benefits"], second["costIndex"] * second["benefits"])]
+        driver = max(drivers, key=lambda d: abs(d[1] - d[2]))[0]
+        return (f"{first['name']} costs {abs(fte_pct):.1f}% {direction} than {second['name']} per full-time employee, "
+                f"driven mostly by {driver}. Contractors cost {abs(contractor_pct):.1f}% "
+                f"{'less' if contractor_pct < 0 else 'more'}."), "template"
+
+    def generate_prose(self) -> int:
+        """Generate (or fetch from the cache) LLM prose for every location pair; returns how many came back"""
+        unit_costs = self.data_service.unit_cost_matrix[0]
+        prompts = [self.pair_prompt(j, k, unit_costs) for j in range(len(unit_costs)) for k in range(len(unit_costs)) if j != k]
+        # Submitted together so the micro-batcher can run them as full batches
+        with ThreadPoolExecutor(max(1, self.llm_service.batcher.max_batch_size)) as pool:
+            texts = list(pool.map(lambda prompt: self.llm_service.generate_text(prompt, self.MAX_NEW_TOKENS), prompts))
+        self.build()
+        return sum(text is not None for text in texts)
+
+    def lookup(self, location1: str, location2: str, job_role: str) -> Dict[str, Any]:
+        if self.revision != self.data_service.revision:
+            with self._lock:
+                if self.revision != self.data_service.revision:
+                    self.build()
+        aliases = self.aliases
+        entry = self.entries.get((aliases.get(str(job_role).lower()), aliases.get(str(location1).lower()),
+                                  aliases.get(str(location2).lower())))
+        if entry is None:
+            raise ValueError("Invalid job role or location")
+        return entry
 
 # ============================================================================
 # PHASE 4: OUTPUT LAYER - FLASK ROUTES
 # ============================================================================
 
+class Metrics:
+    """Prometheus-style counters, histograms and gauges, summed across every worker on the host
+
+    Each worker keeps its series in memory and a daemon thread writes them to
+    <directory>/<pid>.json at most every flush_interval seconds (atomically, via a
+    temporary file). /metrics flushes the serving worker and sums every file in the
+    directory, so a scrape that lands on any worker sees the whole host. Counters and
+    histograms of workers that have exited stay in the totals, as Prometheus expects;
+    gauges are reported per live worker. The directory defaults to one per server under
+    the temp directory, keyed on the master process; "" keeps metrics per process.
+    """
+
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    HISTOGRAMS = {
+        "optiforce_request_seconds": ("Request duration by endpoint", LATENCY_BUCKETS),
+        "optiforce_stage_seconds": ("Duration of each request stage (parse, scenarios, solve, tokenize, generate, decode, serialize, ...)", LATENCY_BUCKETS),
+        "optiforce_generated_tokens": ("Tokens generated per explanation", (1, 5, 10, 25, 50, 100, 150, 200, 300, 500)),
+        "optiforce_generation_tokens_per_second": ("Generated tokens per second of model.generate, per batch", (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)),
+        "optiforce_batch_size": ("Prompts per generate() call", (1, 2, 4, 8, 16, 32))
+    }
+    COUNTERS = {
+        "optiforce_requests_total": "Requests by endpoint and status code",
+        "optiforce_explanations_total": "Explanations by where they came from (llm, cache, template)",
+        "optiforce_allocation_cache_total": "Allocation solver cache lookups by result"
+    }
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: Optional[float] = None):
+        if directory is None:
+            directory = os.environ.get("OPTIFORCE_METRICS_DIR", os.path.join(tempfile.gettempdir(), f"optiforce-metrics-{self._master_id()}"))
+        self.directory = directory or None
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.environ.get("OPTIFORCE_METRICS_FLUSH_SECONDS", 1.0))
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._reset()
+
+    @staticmethod
+    def _master_id() -> str:
+        """Pid plus, where /proc has it, start time of the process that owns this server's workers
+
+        That is the parent when this process is one of its workers: forked from it before
+        importing the app (gunicorn without --preload, where parent and worker share a
+        command line or setproctitle names the parent "gunicorn: master") or spawned by it
+        (uvicorn --workers). Otherwise it is this process: ``python optiforce_app.py``, or a
+        gunicorn --preload master whose workers inherit the directory. The start time keeps
+        a restarted master from reusing a recycled pid's old files.
+        """
+        import multiprocessing
+
+        parent = os.getppid()
+        try:
+            with open("/proc/self/cmdline", "rb") as own, open(f"/proc/{parent}/cmdline", "rb") as parents:
+                own_args, parent_args = own.read(), parents.read()
+            forked_worker = own_args == parent_args or parent_args.startswith(b"gunicorn: master")
+        except OSError:
+            forked_worker = False
+        owner = parent if forked_worker or multiprocessing.parent_process() is not None else os.getpid()
+        try:
+            with open(f"/proc/{owner}/stat") as stat:
+                return f"{owner}-{stat.read().rsplit(')', 1)[1].split()[19]}"
+        except (OSError, IndexError):
+            return str(owner)
+
+    def _reset(self) -> None:
+        """Fresh series for this process (a forked worker must not re-count its parent's)"""
+        self._pid = os.getpid()
+        self._histograms = {}
+        self._counters = {}
+        self._dirty = False
+        self._flusher = None
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+        if self.directory and self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="optiforce-metrics", daemon=True)
+            self._flusher.start()
+
+    def register_gauge(self, name: str, help_text: str, fn) -> None:
+        """fn() returns the gauge's current value (or None to leave it out), read at flush and scrape time"""
+        self.gauges[name] = (help_text, fn)
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        buckets = self.HISTOGRAMS[name][1]
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._check_pid()
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            # Buckets are stored non-cumulative; the last slot before the sum is +Inf
+            index = next((k for k, bound in enumerate(buckets) if value <= bound), len(buckets))
+            series[index] += 1
+            series[-1] += value
+            self._dirty = True
+
+    def inc(self, name: str, amount: float = 1, **labels: Any) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("optiforce_stage_seconds", time.perf_counter() - started, stage=name)
+
+    def _sample_gauges(self) -> List[Any]:
+        values = []
+        for name, (_, fn) in self.gauges.items():
+            try:
+                value = fn()
+            except Exception:
+                value = None
+            if value is not None:
+                values.append([name, float(value)])
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._check_pid()
+            self._dirty = False
+            return {
+                "pid": self._pid,
+                "histograms": [[name, labels, list(series)] for (name, labels), series in self._histograms.items()],
+                "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+                "gauges": self._sample_gauges()
+            }
+
+    def flush(self) -> None:
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot = self.snapshot()
+        path = os.path.join(self.directory, f"{snapshot['pid']}.json")
+        with open(path + ".tmp", "w") as handle:
+            json.dump(snapshot, handle)
+        os.replace(path + ".tmp", path)
+
+    def _flush_loop(self) -> None:
+        while self._pid == os.getpid():
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"Metrics flush failed: {str(e)}")
+
+    def _snapshots(self) -> List[Dict[str, Any]]:
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for entry in os.listdir(self.directory):
+            if not entry.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, entry)) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue  # a worker may be mid-replace; its next flush has the same totals
+        return snapshots
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def render(self) -> str:
+        """Text exposition format, summed over every worker's latest snapshot"""
+        histograms, counters, gauges = {}, {}, []
+        for snapshot in self._snapshots():
+            for name, labels, series in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(series))
+                for k, value in enumerate(series):
+                    total[k] += value
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            if snapshot["pid"] == os.getpid() or self._alive(snapshot["pid"]):
+                gauges += [(name, snapshot["pid"], value) for name, value in snapshot["gauges"]]
+
+        def label_text(labels, *extra):
+            pairs = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        lines = []
+        for name, (help_text, buckets) in self.HISTOGRAMS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ["+Inf"], series[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{label_text(labels, ('le', bound))} {cumulative}")
+                lines.append(f"{name}_sum{label_text(labels)} {series[-1]}")
+                lines.append(f"{name}_count{label_text(labels)} {cumulative}")
+        for name, help_text in self.COUNTERS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f"{name}{label_text(labels)} {value}" for (series_name, labels), value in sorted(counters.items()) if series_name == name]
+        for name, (help_text, _) in self.gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{label_text((), ('worker', pid))} {value}" for gauge, pid, value in sorted(gauges) if gauge == name]
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples the stacks of one request (and the model threads working for it) into flamegraph-ready folded stacks
+
+    Every interval the sampler thread records the request thread's stack, plus the
+    stacks of busy optiforce-* threads such as the batcher running model.generate.
+    The result is one "thread;outer;...;inner count" line per distinct stack, the input
+    format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.request_thread = threading.get_ident()
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="optiforce-profiler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "")
+                if ident != self.request_thread and not (name.startswith("optiforce-") and name != "optiforce-profiler"):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # Helper threads parked on a queue or lock aren't working for anyone
+                if ident != self.request_thread and stack[0].startswith("wait (threading.py"):
+                    continue
+                key = ";".join([name or str(ident)] + stack[::-1])
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self) -> float:
+        """Stop sampling; returns the elapsed seconds"""
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as handle:
+            for stack, count in sorted(self.samples.items()):
+                handle.write(f"{stack} {count}\n")
+
+
 # Initialize services
-data_service = DataIngestionService()
+metrics = Metrics()
+data_service = DataIngestionService(os.environ.get("OPTIFORCE_DATA_DIR"))
 optimization_engine = OptimizationEngine(data_service)
-llm_service = LightweightLLMService()
+risk_simulator = CostRiskSimulator(optimization_engine)
+model_manager = ModelManager()
+inference_url = os.environ.get("OPTIFORCE_INFERENCE_URL")
+llm_service = LightweightLLMService(model_manager, InferenceClient(inference_url) if inference_url else None)
+comparison_index = LocationComparisonIndex(data_service, llm_service)
+
+if model_manager.load_mode == "background" and llm_service.inference_client is None:
+    model_manager.start()
+
+@app.before_request
+def pin_data_version():
+    """Pick up a newly published rate table version between requests"""
+    data_service.poll()
+    g.data_version = data_service.data_version
+
+@app.after_request
+def tag_data_version(response):
+    response.headers["X-Data-Version"] = g.get("data_version", data_service.data_version)
+    return response
+
+# Sampling profiles on request: send X-OptiForce-Profile: 1 and the folded stacks land in
+# OPTIFORCE_PROFILE_DIR (the header is ignored unless that is set)
+PROFILE_DIR = os.environ.get("OPTIFORCE_PROFILE_DIR")
+PROFILE_INTERVAL_MS = float(os.environ.get("OPTIFORCE_PROFILE_INTERVAL_MS", 5))
+PROFILE_MIN_MS = float(os.environ.get("OPTIFORCE_PROFILE_MIN_MS", 0))
+
+def resident_memory_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+metrics.register_gauge("optiforce_model_memory_bytes", "Bytes held by the loaded model's weights and buffers", lambda: model_manager.memory_bytes)
+metrics.register_gauge("optiforce_resident_memory_bytes", "Resident memory of the worker process", resident_memory_bytes)
+metrics.register_gauge("optiforce_batch_queue_depth", "Explanation prompts waiting for the micro-batcher", lambda: llm_service.batcher.stats()["queue_depth"])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_DIR and request.headers.get("X-OptiForce-Profile") == "1":
+        g.profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000.0).start()
+
+@app.after_request
+def record_request(response):
+    """Request duration and status per endpoint (for streams, up to the first byte), plus any profile"""
+    endpoint = request.endpoint or "unmatched"
+    metrics.observe("optiforce_request_seconds", time.perf_counter() - g.get("request_started", time.perf_counter()), endpoint=endpoint)
+    metrics.inc("optiforce_requests_total", endpoint=endpoint, status=response.status_code)
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        elapsed_ms = profiler.stop() * 1000.0
+        if elapsed_ms >= PROFILE_MIN_MS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}-{endpoint}-{os.getpid()}-{elapsed_ms:.0f}ms.folded"
+            profiler.dump(os.path.join(PROFILE_DIR, name))
+            response.headers["X-OptiForce-Profile"] = name
+    return response
+
+# Bodies at least this large are compressed for clients that accept it (brotli if installed, else gzip)
+COMPRESS_MIN_BYTES = int(os.environ.get("OPTIFORCE_COMPRESS_MIN_BYTES", 1024))
+COMPRESSIBLE_TYPES = ("application/json", "text/csv", "text/html", "text/plain", "text/css", "application/javascript")
+
+# Serialized read-only responses per (data revision, request). The ETag is a hash of the
+# body, so every worker hands out the same tag for the same bytes.
+cached_bodies = OrderedDict()
+cached_bodies_lock = threading.Lock()
+
+def cached_body(key: Tuple, build) -> Tuple[bytes, str]:
+    """(body, etag) for data that only changes with the rate tables; build() runs once per revision"""
+    key = (data_service.revision, data_service.data_version, *key)
+    with cached_bodies_lock:
+        cached = cached_bodies.get(key)
+        if cached is not None:
+            cached_bodies.move_to_end(key)
+            return cached
+    body = app.json.dumps_bytes(build())
+    cached = (body, hashlib.sha256(body).hexdigest()[:32])
+    with cached_bodies_lock:
+        cached_bodies[key] = cached
+        while len(cached_bodies) > 256:
+            cached_bodies.popitem(last=False)
+    return cached
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires: compression turns the tags weak
+    return bool(if_none_match) and parse_etags(if_none_match).contains_weak(etag)
+
+def cached_json(key: Tuple, build) -> Response:
+    """A cached_body response, or 304 when the client already has it"""
+    body, etag = cached_body(key, build)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        # Same validator and Vary as the 200 this stands in for (compress_response only touches 200s)
+        response = Response(status=304)
+        response.set_etag(etag, weak=response_encoding(request.headers.get("Accept-Encoding"), len(body)) is not None)
+        response.vary.add("Accept-Encoding")
+    else:
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """br or gzip if the Accept-Encoding header allows it (q=0 refuses), preferring br"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip()[2:] if params.strip().startswith("q=") else "1"
+        try:
+            accepted[name.strip().lower()] = float(quality)
+        except ValueError:
+            continue
+    for encoding in (("br",) if brotli else ()) + ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+def response_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+    """The encoding a 200 body of this size is sent with, or None when it goes uncompressed"""
+    return negotiate_encoding(accept_encoding) if size >= COMPRESS_MIN_BYTES else None
+
+# Compressed bytes of ETagged bodies, so cached responses are compressed once per encoding
+compressed_bodies = OrderedDict()
+compressed_bodies_lock = threading.Lock()
+
+def compress(body: bytes, encoding: str, etag: Optional[str] = None) -> bytes:
+    with compressed_bodies_lock:
+        cached = compressed_bodies.get((etag, encoding)) if etag else None
+    if cached is not None:
+        return cached
+    # Mid-range levels: most of the size win for a fraction of the CPU of the maximum
+    data = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+    if etag:
+        with compressed_bodies_lock:
+            compressed_bodies[(etag, encoding)] = data
+            while len(compressed_bodies) > 256:
+                compressed_bodies.popitem(last=False)
+    return data
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON/text bodies for clients that accept it (streams are left alone)"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = response_encoding(request.headers.get("Accept-Encoding"), len(body))
+    if encoding is None:
+        return response
+    etag, weak = response.get_etag()
+    response.set_data(compress(body, encoding, etag))
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/')
 def home():
     """Main application interface"""
     return render_template('index.html')
 
+# Per-endpoint latency budgets; a request may ask for less via "latency_budget_ms"
+LATENCY_BUDGETS_MS = {
+    "optimize": float(os.environ.get("OPTIFORCE_OPTIMIZE_BUDGET_MS", 8000)),
+    "batch": float(os.environ.get("OPTIFORCE_BATCH_BUDGET_MS", 8000)),
+    "job": float(os.environ.get("OPTIFORCE_JOB_BUDGET_MS", 600000))
+}
+
+MAX_BATCH_LINES = int(os.environ.get("OPTIFORCE_MAX_BATCH_LINES", 10000))
+MAX_SWEEP_POINTS = int(os.environ.get("OPTIFORCE_MAX_SWEEP_POINTS", 100000))
+MAX_SIMULATION_TRIALS = int(os.environ.get("OPTIFORCE_MAX_SIMULATION_TRIALS", 5000000))
+MAX_FRONTIER_HEADCOUNT = int(os.environ.get("OPTIFORCE_MAX_FRONTIER_HEADCOUNT", 100000))
+
+# Interactive projections live in the worker that created them (use sticky sessions with several workers)
+projections = OrderedDict()
+projections_lock = threading.Lock()
+MAX_PROJECTIONS = int(os.environ.get("OPTIFORCE_MAX_PROJECTIONS", 256))
+
+class LatencyBudget:
+    """Wall-clock budget for one request, recording how each stage spent it"""
+
+    def __init__(self, endpoint: str, requested_ms: Optional[Any] = None):
+        self.budget_ms = LATENCY_BUDGETS_MS[endpoint]
+        if requested_ms is not None:
+            self.budget_ms = max(0.0, min(self.budget_ms, float(requested_ms)))
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.budget_ms / 1000.0 - (time.perf_counter() - self.started))
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.stages[name] = seconds * 1000.0
+            metrics.observe("optiforce_stage_seconds", seconds, stage=name)
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        elapsed_ms = (time.perf_counter() - self.started) * 1000.0
+        return {
+            "budget_ms": self.budget_ms,
+            "elapsed_ms": elapsed_ms,
+            "remaining_ms": max(0.0, self.budget_ms - elapsed_ms),
+            "stages_ms": self.stages,
+            **extra
+        }
+
+class SingleFlight:
+    """Coalesce concurrent identical calls: the first caller for a key does the work, duplicates wait for its result
+
+    With a lock directory, callers in other workers on the same host coalesce too. The
+    worker doing the work holds an flock on <dir>/<key>.lock and leaves its result in
+    <dir>/<key>.json; a caller that had to wait for the lock reuses that result if it
+    was written after the caller arrived, instead of repeating the work. Only waiters
+    already queued on the lock can use a result, so files untouched for ``ttl`` seconds
+    are removed by the next leader.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None, ttl: Optional[float] = None):
+        self.lock_dir = lock_dir if lock_dir is not None else os.environ.get("OPTIFORCE_SINGLEFLIGHT_DIR")
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self.ttl = ttl if ttl is not None else float(os.environ.get("OPTIFORCE_SINGLEFLIGHT_TTL_SECONDS", 600))
+        self._swept = 0.0
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+        self.coalesced_across_workers = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def do(self, key: str, fn) -> Tuple[Any, bool]:
+        """Result of fn() for this key, and whether it was shared with another caller's call"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            if self.lock_dir:
+                result, shared = self._run_across_workers(key, fn)
+            else:
+                result, shared = self._execute(fn), False
+            future.set_result(result)
+            return result, shared
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def _execute(self, fn) -> Any:
+        result = fn()
+        with self._lock:
+            self.executed += 1
+        return result
+
+    def _run_across_workers(self, key: str, fn) -> Tuple[Any, bool]:
+        import fcntl
+
+        arrived = time.time()
+        result_path = os.path.join(self.lock_dir, key + ".json")
+        lock_path = os.path.join(self.lock_dir, key + ".lock")
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Keeps a lock in use from looking abandoned to the sweep
+                os.utime(lock_file.fileno())
+                try:
+                    if os.path.getmtime(result_path) >= arrived:
+                        with open(result_path) as f:
+                            result = json.load(f)
+                        with self._lock:
+                            self.coalesced_across_workers += 1
+                        return result, True
+                except (OSError, ValueError):
+                    pass
+
+                result = self._execute(fn)
+                tmp_path = f"{result_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(result, f)
+                os.replace(tmp_path, result_path)
+                return result, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                if arrived - self._swept >= self.ttl:
+                    self._swept = arrived
+                    self._sweep(arrived - self.ttl)
+
+    def _sweep(self, cutoff: float) -> None:
+        """Delete lock and result files last touched before ``cutoff``"""
+        import fcntl
+
+        try:
+            entries = [entry for entry in os.scandir(self.lock_dir) if entry.name.endswith((".lock", ".json", ".tmp"))]
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if not entry.name.endswith(".lock"):
+                    os.unlink(entry.path)
+                    continue
+                # Never pull a lock file out from under a worker that holds it
+                with open(entry.path, "a") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cross_worker": bool(self.lock_dir),
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_across_workers": self.coalesced_across_workers
+        }
+
+single_flight = SingleFlight()
+
+class JobQueueFull(Exception):
+    pass
+
+class JobCancelled(Exception):
+    pass
+
+class JobQueue:
+    """Runs long optimizations in a background thread pool and keeps their results in SQLite
+
+    The SQLite file is shared by every worker on the host, so a job started on one
+    worker can be polled or cancelled through any other. Finished jobs are kept for
+    ttl seconds. Cancelling a queued job stops it from starting; a running job stops
+    at its next checkpoint and its result is discarded.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+    def __init__(self, db_path: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, ttl: Optional[float] = None):
+        self.db_path = db_path or os.environ.get("OPTIFORCE_JOB_DB") or os.path.join(tempfile.gettempdir(), "optiforce-jobs.sqlite3")
+        self.max_workers = max_workers or int(os.environ.get("OPTIFORCE_JOB_WORKERS", 2))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("OPTIFORCE_JOB_QUEUE_MAX", 32))
+        self.ttl = ttl if ttl is not None else float(os.environ.get("OPTIFORCE_JOB_TTL_SECONDS", 3600))
+        self.max_wait = float(os.environ.get("OPTIFORCE_JOB_MAX_WAIT_SECONDS", 25))
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._executor = None
+        self._db = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection and pool (a --preload fork must not reuse the parent's)"""
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, state TEXT NOT NULL, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, expires_at REAL, result TEXT, error TEXT)"
+            )
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="optiforce-job")
+            self._futures = {}
+            self._pid = os.getpid()
+        return self._db
+
+    def _execute(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._connection().execute(sql, params)
+
+    def submit(self, kind: str, fn) -> str:
+        """Queue fn(checkpoint) and return the job id; raises JobQueueFull when at capacity"""
+        now = time.time()
+        self._execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        with self._lock:
+            self._connection()
+            if len(self._futures) >= self.max_workers + self.max_queue:
+                raise JobQueueFull(f"The job queue is full ({len(self._futures)} jobs); try again later")
+            job_id = uuid.uuid4().hex
+            self._db.execute("INSERT INTO jobs (id, kind, state, created_at) VALUES (?, ?, ?, ?)", (job_id, kind, self.QUEUED, now))
+            self._futures[job_id] = self._executor.submit(self._run, job_id, fn)
+        return job_id
+
+    def _run(self, job_id: str, fn) -> None:
+        try:
+            started = self._execute("UPDATE jobs SET state = ?, started_at = ? WHERE id = ? AND state = ?",
+                                    (self.RUNNING, time.time(), job_id, self.QUEUED))
+            if started.rowcount == 0:
+                return  # cancelled while queued
+
+            def checkpoint():
+                if self._state(job_id) == self.CANCELLED:
+                    raise JobCancelled()
+
+            try:
+                outcome, result, error = self.DONE, json.dumps(fn(checkpoint)), None
+            except JobCancelled:
+                return
+            except Exception as e:
+                outcome, result, error = self.FAILED, None, str(e)
+            finished = time.time()
+            # A job cancelled while it ran keeps its cancelled state and its result is dropped
+            self._execute("UPDATE jobs SET state = ?, finished_at = ?, expires_at = ?, result = ?, error = ? WHERE id = ? AND state = ?",
+                          (outcome, finished, finished + self.ttl, result, error, job_id, self.RUNNING))
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+    def _state(self, job_id: str) -> Optional[str]:
+        row = self._execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, job_id: str, wait: float = 0.0) -> Optional[Dict[str, Any]]:
+        """The job, optionally long-polling up to ``wait`` seconds for it to finish"""
+        deadline = time.monotonic() + max(0.0, min(wait, self.max_wait))
+        while True:
+            row = self._execute("SELECT id, kind, state, created_at, started_at, finished_at, expires_at, result, error "
+                                "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or (row[6] is not None and row[6] < time.time()):
+                return None
+            remaining = deadline - time.monotonic()
+            if row[2] in self.FINISHED or remaining <= 0:
+                break
+            # Jobs of this worker wake the poller as soon as they finish; others are polled
+            future = self._futures.get(job_id)
+            if future is not None:
+                try:
+                    future.result(min(remaining, 0.5))
+                except Exception:
+                    pass
+            else:
+                time.sleep(min(remaining, 0.1))
+        job = dict(zip(("id", "kind", "state", "created_at", "started_at", "finished_at", "expires_at", "result", "error"), row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        self._execute("UPDATE jobs SET state = ?, finished_at = ?, expires_at = ? WHERE id = ? AND state IN (?, ?)",
+                      (self.CANCELLED, now, now + self.ttl, job_id, self.QUEUED, self.RUNNING))
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            with self._lock:
+                self._futures.pop(job_id, None)
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._execute("SELECT state, COUNT(*) FROM jobs WHERE state IN (?, ?) GROUP BY state",
+                                    (self.QUEUED, self.RUNNING)).fetchall())
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "ttl_seconds": self.ttl,
+            "worker_jobs": len(self._futures),
+            "queue_depth": counts.get(self.QUEUED, 0),
+            "running": counts.get(self.RUNNING, 0)
+        }
+
+job_queue = JobQueue()
+
+def wants_async(options: Dict[str, Any], prefer: str = "") -> bool:
+    """Async job mode: "async": true in the request, or a Prefer: respond-async header"""
+    return str(options.get('async', '')).lower() in ('1', 'true', 'yes') or 'respond-async' in prefer
+
+def job_accepted(kind: str, fn):
+    """Queue fn and answer 202 with where to poll for it"""
+    try:
+        job_id = job_queue.submit(kind, fn)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    status_url = f"/api/jobs/{job_id}"
+    return jsonify({"job_id": job_id, "state": JobQueue.QUEUED, "status_url": status_url}), 202, {"Location": status_url}
+
+def optimization_inputs(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The optimize request fields with their defaults applied"""
+    return {
+        "job_role": data.get('job_role'),
+        "location": data.get('location'),
+        "headcount": int(data.get('headcount', 1)),
+        "constraint": data.get('constraint', 'balanced'),
+        "employment_type": data.get('employment_type', 'both')
+    }
+
+def build_optimization(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse an optimize request and compute its scenarios and savings (everything but the explanation)"""
+    with metrics.stage("parse"):
+        inputs = optimization_inputs(data)
+    job_role, location, headcount = inputs["job_role"], inputs["location"], inputs["headcount"]
+    constraint, employment_type = inputs["constraint"], inputs["employment_type"]
+
+    # Generate scenarios; they become dicts only here, for the response and the prompt
+    with metrics.stage("scenarios"):
+        scenarios = optimization_engine.scenario_set(job_role, location, headcount, constraint, employment_type)
+
+    return {
+        "scenarios": scenarios.to_dict(),
+        "savings": OptimizationEngine._savings(scenarios.total_cost("current"), scenarios.total_cost("cost_effective")),
+        "metadata": {
+            "job_role": job_role,
+            "location": location,
+            "headcount": headcount,
+            "constraint": constraint,
+            "employment_type": employment_type,
+            "data_version": data_service.data_version,
+            "model_state": "remote" if llm_service.inference_client else model_manager.state
+        }
+    }
+
+def sse_event(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {app.json.dumps(payload)}\n\n"
+
+def run_optimization(data: Dict[str, Any], endpoint: str = "optimize", checkpoint=None) -> Dict[str, Any]:
+    """Scenarios, savings and the explanation for one optimize request, within its latency budget"""
+    budget = LatencyBudget(endpoint, data.get('latency_budget_ms'))
+
+    # The deterministic optimization result always comes back, whatever the budget
+    with budget.stage("optimization"):
+        response = build_optimization(data)
+    if checkpoint:
+        checkpoint()
+
+    # Generate AI explanation with whatever budget is left, else fall back to the template
+    with budget.stage("explanation"):
+        ai_explanation, source = llm_service.explain(response["scenarios"], response["metadata"]["job_role"], budget.remaining())
+    response["ai_explanation"] = ai_explanation
+    response["latency"] = budget.report(explanation_source=source)
+    return response
+
 @app.route('/api/optimize', methods=['POST'])
 def optimize_workforce():
     """Main optimization endpoint"""
     try:
         data = request.get_json()
+        if wants_async(data, request.headers.get('Prefer', '')):
+            optimization_inputs(data)  # reject malformed input now rather than in the job
+            return job_accepted("optimize", lambda checkpoint: run_optimization(data, "job", checkpoint))
 
-        job_role = data.get('job_role')
-        location = data.get('location')
-        headcount = int(data.get('headcount', 1))
-        constraint = data.get('constraint', 'balanced')
+        # Identical requests arriving together (a team opening the same dashboard) share one run
+        key = SingleFlight.make_key("optimize", optimization_inputs(data), data.get('latency_budget_ms'), data_service.data_version)
+        response, coalesced = single_flight.do(key, lambda: run_optimization(data))
+        with metrics.stage("serialize"):
+            return jsonify({**response, "coalesced": coalesced})
 
-        # Simulate processing time for demonstration
-        time.sleep(0.5)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Generate scenarios
-        scenarios = optimization_engine.generate_scenarios(job_role, location, headcount, constraint)
+@app.route('/api/optimize/stream', methods=['GET', 'POST'])
+def optimize_workforce_stream():
+    """Streaming optimization endpoint: scenarios first, then explanation tokens as Server-Sent Events"""
+    try:
+        data = request.get_json(silent=True) or request.args.to_dict()
+        result = build_optimization(data)
+        stream = llm_service.stream_explanation(result["scenarios"], result["metadata"]["job_role"])
+    except StreamsBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Generate AI explanation
-        ai_explanation = llm_service.generate_explanation(scenarios, job_role)
+    def events():
+        # A client that goes away closes this generator, which stops the model mid-explanation
+        try:
+            yield sse_event("scenarios", result)
+            pieces = []
+            try:
+                for piece in stream:
+                    pieces.append(piece)
+                    yield sse_event("token", {"text": piece})
+            except Exception as e:
+                yield sse_event("error", {"error": str(e)})
+                return
+            yield sse_event("done", {"ai_explanation": "".join(pieces)})
+        finally:
+            stream.close()
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def read_batch_lines() -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Plan lines and options from a JSON body, a CSV upload or a raw text/csv body"""
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        text = upload.read().decode('utf-8-sig') if upload is not None else request.get_data(as_text=True)
+        lines = [{key.strip(): (value or '').strip() for key, value in row.items() if key} for row in csv.DictReader(io.StringIO(text))]
+        return lines, request.form.to_dict() or request.args.to_dict()
+
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get('lines'), list):
+        raise ValueError("Expected a JSON object with a 'lines' list or a CSV upload")
+    return data['lines'], data
+
+def run_batch(lines: List[Dict[str, Any]], options: Dict[str, Any], endpoint: str = "batch", checkpoint=None) -> Dict[str, Any]:
+    """Optimize a whole plan, plus one consolidated explanation when asked for"""
+    budget = LatencyBudget(endpoint, options.get('latency_budget_ms'))
+
+    # Lines without their own constraint inherit the plan-wide one
+    default_constraint = options.get('constraint')
+    if default_constraint:
+        lines = [line if line.get('constraint') else dict(line, constraint=default_constraint) for line in lines]
+
+    with budget.stage("optimization"):
+        response = optimization_engine.generate_batch(lines)
+    if checkpoint:
+        checkpoint()
+
+    if str(options.get('explain', '')).lower() in ('1', 'true', 'yes'):
+        with budget.stage("explanation"):
+            response["ai_explanation"], source = llm_service.explain(
+                response["aggregate"]["scenarios"], f"{len(lines)}-line workforce plan", budget.remaining())
+        response["latency"] = budget.report(explanation_source=source)
+    else:
+        response["latency"] = budget.report()
+    return response
+
+@app.route('/api/optimize/batch', methods=['POST'])
+def optimize_batch():
+    """Whole-plan optimization: many role/location/headcount lines in one call"""
+    try:
+        lines, options = read_batch_lines()
+        if not lines:
+            raise ValueError("The plan has no lines")
+        if len(lines) > MAX_BATCH_LINES:
+            raise ValueError(f"A plan may have at most {MAX_BATCH_LINES} lines")
+        if wants_async(options, request.headers.get('Prefer', '')):
+            return job_accepted("batch", lambda checkpoint: run_batch(lines, options, "job", checkpoint))
 
-        # Calculate savings
-        current_cost = scenarios["current"]["total_cost"]
-        optimized_cost = scenarios["cost_effective"]["total_cost"]
-        savings = current_cost - optimized_cost
-        savings_percentage = (savings / current_cost) * 100 if current_cost > 0 else 0
+        return jsonify(run_batch(lines, options))
 
-        response = {
-            "scenarios": scenarios,
-            "ai_explanation": ai_explanation,
-            "savings": {
-                "absolute": savings,
-                "percentage": savings_percentage,
-                "current_cost": current_cost,
-                "optimized_cost": optimized_cost
-            },
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/jobs')
+def list_jobs():
+    """Job pool capacity and queue depth"""
+    return jsonify(job_queue.stats())
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """Poll a job (long-poll with ?wait=seconds) or cancel it with DELETE"""
+    try:
+        if request.method == 'DELETE':
+            job = job_queue.cancel(job_id)
+        else:
+            job = job_queue.get(job_id, float(request.args.get('wait', 0)))
+        if job is None:
+            return jsonify({"error": "Unknown or expired job"}), 404
+        return jsonify(job)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/optimize/sweep', methods=['GET', 'POST'])
+def optimize_sweep():
+    """Headcount sensitivity sweep: scenario totals for every headcount in a range, as columns"""
+    try:
+        data = request.get_json(silent=True) or request.args.to_dict()
+        start = int(data.get('start', 1))
+        stop = int(data.get('stop', 1000))
+        step = int(data.get('step', 1))
+        if step <= 0 or start <= 0 or stop < start:
+            raise ValueError("Expected 0 < start <= stop and a positive step")
+        if (stop - start) // step + 1 > MAX_SWEEP_POINTS:
+            raise ValueError(f"A sweep may have at most {MAX_SWEEP_POINTS} points")
+
+        job_role = data.get('job_role')
+        location = data.get('location')
+        constraint = data.get('constraint', 'balanced')
+        employment_type = data.get('employment_type', 'both')
+        columns = optimization_engine.sweep(job_role, location, np.arange(start, stop + 1, step), constraint, employment_type)
+
+        # Infeasible headcounts come back as NaN, which JSON spells null
+        return jsonify({
+            "columns": {key: [None if value != value else value for value in column.tolist()] for key, column in columns.items()},
             "metadata": {
                 "job_role": job_role,
                 "location": location,
-                "headcount": headcount,
-                "constraint": constraint
+                "constraint": constraint,
+                "employment_type": employment_type
             }
-        }
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/optimize/simulate', methods=['POST'])
+def optimize_simulate():
+    """Monte Carlo cost-risk simulation: P10/P50/P90 total cost per scenario"""
+    try:
+        data = request.get_json()
+        trials = int(data.get('trials', 100000))
+        if trials > MAX_SIMULATION_TRIALS:
+            raise ValueError(f"A simulation may run at most {MAX_SIMULATION_TRIALS} trials")
+        seed = data.get('seed')
+
+        result = risk_simulator.simulate(
+            data.get('job_role'), data.get('location'), int(data.get('headcount', 1)),
+            data.get('constraint', 'balanced'), data.get('employment_type', 'both'),
+            trials=trials, seed=int(seed) if seed is not None else None, workers=int(data.get('workers', 1)))
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/optimize/frontier', methods=['POST'])
+def optimize_frontier():
+    """Cost vs risk Pareto frontier: every allocation no other one beats on both cost and risk"""
+    try:
+        data = request.get_json()
+        inputs = optimization_inputs(data)
+        if inputs["headcount"] > MAX_FRONTIER_HEADCOUNT:
+            raise ValueError(f"A frontier may cover at most {MAX_FRONTIER_HEADCOUNT} positions")
+        max_points = data.get('max_points')
+
+        result = optimization_engine.frontier(
+            inputs["job_role"], inputs["location"], inputs["headcount"], inputs["constraint"], inputs["employment_type"],
+            risk_weights=data.get('risk_weights'), max_points=int(max_points) if max_points is not None else None)
+        result["metadata"] = dict(inputs, data_version=data_service.data_version)
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+def projection_response(projection_id: str, projection: WorkforceProjection, started: float,
+                        line_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    compute_ms = (time.perf_counter() - started) * 1000.0
+    return {"id": projection_id, "projection": projection.summary(line_ids), "compute_ms": compute_ms}
+
+@app.route('/api/projections', methods=['POST'])
+def create_projection():
+    """Multi-year projection from explicit plan lines or from one optimization scenario"""
+    try:
+        data = request.get_json()
+        started = time.perf_counter()
+        options = {"horizon_years": int(data.get('horizon_years', 3)), "raises": data.get('raises')}
+        if data.get('lines') is not None:
+            projection = WorkforceProjection(data_service, data['lines'], **options)
+        else:
+            projection = WorkforceProjection.from_scenario(
+                optimization_engine, data.get('job_role'), data.get('location'), int(data.get('headcount', 1)),
+                data.get('constraint', 'balanced'), data.get('employment_type', 'both'),
+                data.get('scenario', 'cost_effective'), **options)
+            # Scenario-seeded plans may set one ramp/conversion for every line
+            defaults = {key: data[key] for key in WorkforceProjection.LINE_DEFAULTS if key in data}
+            if defaults:
+                projection.update(lines={line_id: defaults for line_id in projection.lines})
+
+        projection_id = uuid.uuid4().hex
+        with projections_lock:
+            projections[projection_id] = projection
+            while len(projections) > MAX_PROJECTIONS:
+                projections.popitem(last=False)
+        return jsonify(projection_response(projection_id, projection, started))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/projections/<projection_id>', methods=['GET', 'PATCH'])
+def edit_projection(projection_id):
+    """Read a projection, or apply what-if edits and recompute only the affected cells"""
+    with projections_lock:
+        projection = projections.get(projection_id)
+        if projection is not None:
+            projections.move_to_end(projection_id)
+    if projection is None:
+        return jsonify({"error": "Unknown projection"}), 404
+    try:
+        started = time.perf_counter()
+        if request.method == 'GET':
+            return jsonify(projection_response(projection_id, projection, started))
 
-        return jsonify(response)
+        # Edits only send back the lines they touched, keeping what-if round trips small
+        data = request.get_json()
+        recomputed = projection.update(lines=data.get('lines'), raises=data.get('raises'), remove=data.get('remove'))
+        return jsonify(projection_response(projection_id, projection, started, recomputed))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -700,52 +3687,84 @@ def llm_explain():
     """Dedicated LLM explanation endpoint"""
     try:
         data = request.get_json()
-        prompt = data.get('prompt', '')
-
-        # Simulate lightweight LLM processing
-        time.sleep(0.3)
 
-        # Generate contextual explanation
-        explanation = llm_service.generate_location_comparison(
+        # Answered from the precomputed comparison index; no model call on the request path
+        comparison = comparison_index.lookup(
             data.get('location1', 'India'),
             data.get('location2', 'USA'),
             data.get('job_role', 'Software Engineer')
         )
 
-        return jsonify({"explanation": explanation})
+        return jsonify(comparison)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-@app.route('/api/cost-calculator', methods=['POST'])
+def selection(data, name: str) -> Optional[List[str]]:
+    """A list field given as a list, a comma-separated string, or a single plural/singular value"""
+    value = data.get(name + 's', data.get(name))
+    if value is None or isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+@app.route('/api/cost-calculator', methods=['GET', 'POST'])
 def cost_calculator():
-    """Real-time cost calculation endpoint"""
+    """Cost breakdown for any set of roles x locations x employment types, revalidated by ETag"""
     try:
-        data = request.get_json()
+        data = request.get_json() if request.method == 'POST' else request.args
+        job_roles, locations = selection(data, 'job_role'), selection(data, 'location')
+        employment_types, headcount = selection(data, 'employment_type'), int(data.get('headcount', 1))
 
-        job_role = data.get('job_role')
-        location = data.get('location')
-        employment_type = data.get('employment_type', 'fte')
+        def build():
+            grid = optimization_engine.cost_grid(job_roles, locations, employment_types, headcount)
+            grid["data_version"] = data_service.data_version
+            return grid
 
-        if employment_type == 'contractor':
-            cost_data = optimization_engine.calculate_contractor_cost(job_role, location)
-        else:
-            cost_data = optimization_engine.calculate_fte_cost(job_role, location)
-
-        return jsonify(cost_data)
+        return cached_json(("cost-calculator", json.dumps([job_roles, locations, employment_types, headcount])), build)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: the worker is up and serving"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: 200 only once the explanation model is warm"""
+    if llm_service.inference_client is None:
+        model_manager.start()
+    status = {**llm_service.status(), "data_version": data_service.data_version, "coalescing": single_flight.stats(), "jobs": job_queue.stats()}
+    warm = status.get("ready") or status.get("state") == ModelManager.DISABLED
+    return jsonify(status), 200 if warm else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint, summed across every worker on the host"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route('/api/locations')
 def get_locations():
     """Get available locations data"""
-    return jsonify(data_service.locations)
+    return cached_json(("locations",), lambda: data_service.locations)
 
 @app.route('/api/job-roles')
 def get_job_roles():
     """Get available job roles data"""
-    return jsonify(data_service.job_roles)
+    return cached_json(("job-roles",), lambda: data_service.job_roles)
+
+@app.cli.command("build-comparisons")
+def build_comparisons():
+    """Generate the LLM prose for every location pair ahead of time (flask --app optiforce_app build-comparisons)"""
+    if not llm_service.cache.db_path:
+        raise SystemExit("Set OPTIFORCE_EXPLANATION_CACHE_DB so the workers can read the prose back")
+    if llm_service.inference_client is None:
+        model_manager.start()
+        if not model_manager.wait():
+            raise SystemExit(f"No model to generate with: {model_manager.error or model_manager.state}")
+    generated = comparison_index.generate_prose()
+    print(f"{generated} location pair explanations cached")
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
@@ -0,0 +1,170 @@
+"""OptiForce ASGI serving mode: the same API, with explanation waits that don't pin a worker.
+
+    uvicorn optiforce_asgi:app --workers 4
+
+/api/optimize and /api/optimize/stream are handled on the event loop, with
+the blocking part (optimization plus explanation) offloaded to a bounded
+thread pool. /api/locations and /api/job-roles are answered on the loop
+directly from their cached bodies, so they keep serving at full speed while
+generations are in flight.
+Every other route is served by the Flask app from optiforce_app, mounted as
+WSGI. Needs starlette, a2wsgi and an ASGI server such as uvicorn.
+"""
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import optiforce_app as core
+
+# Blocking explanation work runs here; with a local model these threads feed the micro-batcher
+INFERENCE_THREADS = int(os.environ.get("OPTIFORCE_ASGI_INFERENCE_THREADS", max(4, core.llm_service.batcher.max_batch_size)))
+inference_executor = ThreadPoolExecutor(INFERENCE_THREADS, thread_name_prefix="optiforce-asgi-inference")
+
+
+def offload(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(inference_executor, fn, *args)
+
+
+def pin_data_version() -> dict:
+    """The native-route counterpart of the Flask before/after_request hooks"""
+    core.data_service.poll()
+    return {"X-Data-Version": core.data_service.data_version}
+
+
+def recorded(route):
+    """Request duration and status per endpoint, as the Flask app's record_request hook keeps them"""
+    @functools.wraps(route)
+    async def handler(request):
+        started, status = time.perf_counter(), 500
+        try:
+            response = await route(request)
+            status = response.status_code
+            return response
+        finally:
+            # Streams count up to the first byte, as they do under Flask
+            core.metrics.observe("optiforce_request_seconds", time.perf_counter() - started, endpoint=route.__name__)
+            core.metrics.inc("optiforce_requests_total", endpoint=route.__name__, status=status)
+    return handler
+
+
+def json_response(request, payload, status: int = 200, headers=None, etag=None) -> Response:
+    """JSON through the Flask app's encoder, compressed by the same rules as its responses"""
+    body = payload if isinstance(payload, bytes) else core.app.json.dumps_bytes(payload)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = core.response_encoding(request.headers.get("accept-encoding"), len(body))
+    compressed = status == 200 and encoding is not None
+    if compressed:
+        body = core.compress(body, encoding, etag)
+        headers["Content-Encoding"] = encoding
+    if etag:
+        headers["ETag"] = f'W/"{etag}"' if compressed else f'"{etag}"'
+        headers["Cache-Control"] = "no-cache"
+    return Response(body, status, headers=headers, media_type="application/json")
+
+
+def reference_response(request, key, build) -> Response:
+    """A cached_body response, or 304 when the client already has it"""
+    headers = pin_data_version()
+    body, etag = core.cached_body(key, build)
+    if core.etag_matches(request.headers.get("if-none-match"), etag):
+        # Same validator and Vary as the 200 this stands in for
+        weak = core.response_encoding(request.headers.get("accept-encoding"), len(body)) is not None
+        return Response(status_code=304, headers={**headers, "ETag": f'W/"{etag}"' if weak else f'"{etag}"',
+                                                  "Vary": "Accept-Encoding", "Cache-Control": "no-cache"})
+    return json_response(request, body, headers=headers, etag=etag)
+
+
+@recorded
+async def optimize_workforce(request):
+    """Main optimization endpoint"""
+    headers = pin_data_version()
+    try:
+        data = await request.json()
+        if core.wants_async(data, request.headers.get('prefer', '')):
+            core.optimization_inputs(data)
+            try:
+                job_id = core.job_queue.submit("optimize", lambda checkpoint: core.run_optimization(data, "job", checkpoint))
+            except core.JobQueueFull as e:
+                return json_response(request, {"error": str(e)}, 503, headers={**headers, "Retry-After": "5"})
+            status_url = f"/api/jobs/{job_id}"
+            return json_response(request, {"job_id": job_id, "state": core.JobQueue.QUEUED, "status_url": status_url}, 202,
+                                 headers={**headers, "Location": status_url})
+
+        key = core.SingleFlight.make_key("optimize", core.optimization_inputs(data), data.get('latency_budget_ms'),
+                                         core.data_service.data_version)
+        response, coalesced = await offload(core.single_flight.do, key, lambda: core.run_optimization(data))
+        with core.metrics.stage("serialize"):
+            return json_response(request, {**response, "coalesced": coalesced}, headers=headers)
+
+    except Exception as e:
+        return json_response(request, {"error": str(e)}, 400, headers=headers)
+
+
+@recorded
+async def optimize_workforce_stream(request):
+    """Streaming optimization endpoint: scenarios first, then explanation tokens as Server-Sent Events"""
+    headers = pin_data_version()
+    try:
+        data = dict(request.query_params)
+        if request.method == "POST":
+            try:
+                data = await request.json()
+            except ValueError:
+                pass
+        result = await offload(core.build_optimization, data)
+        stream = await offload(core.llm_service.stream_explanation, result["scenarios"], result["metadata"]["job_role"])
+    except core.StreamsBusy as e:
+        return json_response(request, {"error": str(e)}, 503, headers={**headers, "Retry-After": "5"})
+    except Exception as e:
+        return json_response(request, {"error": str(e)}, 400, headers=headers)
+
+    async def events():
+        # A disconnect cancels this generator, which stops the model mid-explanation
+        try:
+            yield core.sse_event("scenarios", result)
+            pieces = []
+            try:
+                while True:
+                    piece = await offload(next, stream, None)
+                    if piece is None:
+                        break
+                    pieces.append(piece)
+                    yield core.sse_event("token", {"text": piece})
+            except Exception as e:
+                yield core.sse_event("error", {"error": str(e)})
+                return
+            yield core.sse_event("done", {"ai_explanation": "".join(pieces)})
+        finally:
+            stream.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={**headers, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@recorded
+async def get_locations(request):
+    """Get available locations data"""
+    return reference_response(request, ("locations",), lambda: core.data_service.locations)
+
+
+@recorded
+async def get_job_roles(request):
+    """Get available job roles data"""
+    return reference_response(request, ("job-roles",), lambda: core.data_service.job_roles)
+
+
+app = Starlette(routes=[
+    Route("/api/optimize", optimize_workforce, methods=["POST"]),
+    Route("/api/optimize/stream", optimize_workforce_stream, methods=["GET", "POST"]),
+    Route("/api/locations", get_locations),
+    Route("/api/job-roles", get_job_roles),
+    Mount("/", app=WSGIMiddleware(core.app))
+])
@@ -3,35 +3,25 @@
 // Application Data
 const APP_DATA = {
     jobRoles: [
-        {"id": "software-engineer", "name": "Software Engineer", "baseMultiplier": 1.0},
-        {"id": "data-scientist", "name": "Data Scientist", "baseMultiplier": 1.2},
-        {"id": "product-manager", "name": "Product Manager", "baseMultiplier": 1.1},
-        {"id": "devops-engineer", "name": "DevOps Engineer", "baseMultiplier": 1.05},
-        {"id": "ui-ux-designer", "name": "UI/UX Designer", "baseMultiplier": 0.9},
-        {"id": "marketing-manager", "name": "Marketing Manager", "baseMultiplier": 0.95},
-        {"id": "sales-manager", "name": "Sales Manager", "baseMultiplier": 1.0},
-        {"id": "hr-manager", "name": "HR Manager", "baseMultiplier": 0.85}
+        {"id": "software-engineer", "name": "Software Engineer"},
+        {"id": "data-scientist", "name": "Data Scientist"},
+        {"id": "product-manager", "name": "Product Manager"},
+        {"id": "devops-engineer", "name": "DevOps Engineer"},
+        {"id": "ui-ux-designer", "name": "UI/UX Designer"},
+        {"id": "marketing-manager", "name": "Marketing Manager"},
+        {"id": "sales-manager", "name": "Sales Manager"},
+        {"id": "hr-manager", "name": "HR Manager"}
     ],
     locations: [
-        {"id": "usa", "name": "USA", "costIndex": 1.0, "socialCharges": 0.12, "benefits": 0.25, "contractorPremium": 2.0},
-        {"id": "germany", "name": "Germany", "costIndex": 0.85, "socialCharges": 0.45, "benefits": 0.22, "contractorPremium": 1.8},
-        {"id": "india", "name": "India", "costIndex": 0.25, "socialCharges": 0.12, "benefits": 0.08, "contractorPremium": 1.2},
-        {"id": "portugal", "name": "Portugal", "costIndex": 0.55, "socialCharges": 0.23, "benefits": 0.15, "contractorPremium": 1.5},
-        {"id": "poland", "name": "Poland", "costIndex": 0.45, "socialCharges": 0.35, "benefits": 0.18, "contractorPremium": 1.4},
-        {"id": "ukraine", "name": "Ukraine", "costIndex": 0.30, "socialCharges": 0.22, "benefits": 0.12, "contractorPremium": 1.3},
-        {"id": "philippines", "name": "Philippines", "costIndex": 0.20, "socialCharges": 0.15, "benefits": 0.10, "contractorPremium": 1.2},
-        {"id": "mexico", "name": "Mexico", "costIndex": 0.35, "socialCharges": 0.28, "benefits": 0.16, "contractorPremium": 1.4}
+        {"id": "usa", "name": "USA"},
+        {"id": "germany", "name": "Germany"},
+        {"id": "india", "name": "India"},
+        {"id": "portugal", "name": "Portugal"},
+        {"id": "poland", "name": "Poland"},
+        {"id": "ukraine", "name": "Ukraine"},
+        {"id": "philippines", "name": "Philippines"},
+        {"id": "mexico", "name": "Mexico"}
     ],
-    baseSalaries: {
-        "software-engineer": 95000,
-        "data-scientist": 110000,
-        "product-manager": 105000,
-        "devops-engineer": 100000,
-        "ui-ux-designer": 85000,
-        "marketing-manager": 90000,
-        "sales-manager": 95000,
-        "hr-manager": 80000
-    },
     
     constraints: [
         {"id": "cost-focused", "name": "Cost Focused", "description": "Prioritize maximum cost savings"},
@@ -44,6 +34,27 @@ const APP_DATA = {
 let currentAnalysis = null;
 let charts = {};
 let currentScenario = 'cost-effective';
+let costGrid = null;
+
+// Every role x location x employment type cost from /api/cost-calculator. The browser
+// revalidates with the ETag, so refetching is a 304 until the rates change.
+function loadCostGrid() {
+    return fetch('/api/cost-calculator', { cache: 'no-cache' })
+        .then(response => {
+            if (!response.ok) throw new Error(`Cost grid request failed: ${response.status}`);
+            return response.json();
+        })
+        .then(grid => {
+            const index = ids => Object.fromEntries(ids.map((id, i) => [id, i]));
+            costGrid = {
+                ...grid,
+                roleIndex: index(grid.job_roles),
+                locationIndex: index(grid.locations),
+                typeIndex: index(grid.employment_types)
+            };
+            return costGrid;
+        });
+}
 
 // Utility Functions
 function formatCurrency(amount) {
@@ -61,153 +72,66 @@ function formatPercentage(value) {
 
 // Cost Calculation Engine
 class CostOptimizer {
-    constructor() {
-        this.scenarios = {};
-    }
-
     calculateEmployeeCost(jobRole, location, headcount, employmentType = 'fte') {
-        const baseSalary = APP_DATA.baseSalaries[jobRole];
-        const locationData = APP_DATA.locations.find(l => l.id === location);
-        const roleData = APP_DATA.jobRoles.find(r => r.id === jobRole);
+        const role = costGrid ? costGrid.roleIndex[jobRole] : undefined;
+        const place = costGrid ? costGrid.locationIndex[location] : undefined;
 
-        if (!baseSalary || !locationData || !roleData) {
+        if (role === undefined || place === undefined) {
             throw new Error('Invalid job role or location');
         }
 
-        // Base salary adjusted for location and role
-        const adjustedSalary = baseSalary * locationData.costIndex * roleData.baseMultiplier;
-        
-        // Social charges and benefits
-        const socialCharges = adjustedSalary * locationData.socialCharges;
-        const benefits = adjustedSalary * locationData.benefits;
-        
-        // Total cost per employee
-        let costPerEmployee = adjustedSalary + socialCharges + benefits;
-        
-        // Apply contractor premium if applicable
-        if (employmentType === 'contractor') {
-            costPerEmployee *= locationData.contractorPremium;
-        }
+        // Per-employee components as priced by the server
+        const type = costGrid.typeIndex[employmentType];
+        const baseSalary = costGrid.base_salary[role][place][type];
+        const socialCharges = costGrid.social_charges[role][place][type];
+        const benefits = costGrid.benefits[role][place][type];
+        const costPerEmployee = costGrid.unit_cost[role][place][type];
 
         return {
-            baseSalary: adjustedSalary,
+            baseSalary,
             socialCharges,
             benefits,
             totalCost: costPerEmployee,
             totalAnnualCost: costPerEmployee * headcount,
             breakdown: {
-                salary: adjustedSalary,
+                salary: baseSalary,
                 socialCharges,
                 benefits,
-                contractorPremium: employmentType === 'contractor' ? costPerEmployee - (adjustedSalary + socialCharges + benefits) : 0
+                contractorPremium: employmentType === 'contractor' ? costPerEmployee - costGrid.unit_cost[role][place][costGrid.typeIndex.fte] : 0
             }
         };
     }
+}
 
-    generateOptimizationScenarios(jobRole, primaryLocation, headcount, constraints) {
-        const scenarios = {};
-        
-        // Current Strategy (all in primary location)
-        scenarios.current = {
-            name: 'Current Strategy',
-            description: 'All employees in primary location',
-            distribution: [{ location: primaryLocation, percentage: 1.0, headcount: headcount }],
-            totalCost: this.calculateEmployeeCost(jobRole, primaryLocation, headcount).totalAnnualCost,
-            risk: 'Low',
-            quality: 'High'
-        };
-
-        // Most Cost-Effective Mix
-        const sortedLocations = APP_DATA.locations
-            .map(loc => ({
-                ...loc,
-                cost: this.calculateEmployeeCost(jobRole, loc.id, 1).totalCost
-            }))
-            .sort((a, b) => a.cost - b.cost);
-
-        scenarios['cost-effective'] = this.generateCostEffectiveScenario(jobRole, headcount, sortedLocations, constraints);
-        scenarios.balanced = this.generateBalancedScenario(jobRole, primaryLocation, headcount, sortedLocations, constraints);
-
-        return scenarios;
-    }
-
-    generateCostEffectiveScenario(jobRole, headcount, sortedLocations, constraints) {
-        // Distribute across 2-3 most cost-effective locations
-        const topLocations = sortedLocations.slice(0, 3);
-        let distribution = [];
-        let totalCost = 0;
-
-        if (constraints === 'cost-focused') {
-            // 70% in cheapest location, 30% distributed among others
-            const primary = Math.floor(headcount * 0.7);
-            const secondary = Math.floor(headcount * 0.2);
-            const tertiary = headcount - primary - secondary;
-
-            distribution = [
-                { location: topLocations[0].id, percentage: primary / headcount, headcount: primary },
-                { location: topLocations[1].id, percentage: secondary / headcount, headcount: secondary }
-            ];
-
-            if (tertiary > 0) {
-                distribution.push({ location: topLocations[2].id, percentage: tertiary / headcount, headcount: tertiary });
-            }
-        } else {
-            // More balanced distribution for other constraints
-            const each = Math.floor(headcount / 2);
-            const remainder = headcount - (each * 2);
-
-            distribution = [
-                { location: topLocations[0].id, percentage: each / headcount, headcount: each },
-                { location: topLocations[1].id, percentage: (each + remainder) / headcount, headcount: each + remainder }
-            ];
-        }
-
-        // Calculate total cost
-        distribution.forEach(dist => {
-            const cost = this.calculateEmployeeCost(jobRole, dist.location, dist.headcount);
-            totalCost += cost.totalAnnualCost;
-        });
-
-        return {
-            name: 'Most Cost-Effective',
-            description: 'Optimized for maximum cost savings',
-            distribution,
-            totalCost,
-            risk: 'Medium',
-            quality: 'Medium-High'
-        };
-    }
-
-    generateBalancedScenario(jobRole, primaryLocation, headcount, sortedLocations, constraints) {
-        // Mix of primary location and cost-effective alternatives
-        const primaryCount = Math.floor(headcount * 0.4);
-        const secondaryCount = Math.floor(headcount * 0.4);
-        const tertiaryCount = headcount - primaryCount - secondaryCount;
-
-        const distribution = [
-            { location: primaryLocation, percentage: primaryCount / headcount, headcount: primaryCount },
-            { location: sortedLocations[0].id, percentage: secondaryCount / headcount, headcount: secondaryCount }
-        ];
-
-        if (tertiaryCount > 0) {
-            distribution.push({ location: sortedLocations[1].id, percentage: tertiaryCount / headcount, headcount: tertiaryCount });
-        }
-
-        let totalCost = 0;
-        distribution.forEach(dist => {
-            const cost = this.calculateEmployeeCost(jobRole, dist.location, dist.headcount);
-            totalCost += cost.totalAnnualCost;
-        });
+// Dashboard view of the server's scenarios: the solver's allocation, one entry per location and employment type
+const SCENARIO_KEYS = { 'cost-effective': 'cost_effective', 'balanced': 'balanced', 'current': 'current' };
+const SCENARIO_PROFILES = {
+    'cost-effective': { risk: 'Medium', quality: 'Medium-High' },
+    'balanced': { risk: 'Low-Medium', quality: 'High' },
+    'current': { risk: 'Low', quality: 'High' }
+};
 
-        return {
-            name: 'Balanced Approach',
-            description: 'Balance of cost, risk, and quality',
-            distribution,
-            totalCost,
-            risk: 'Low-Medium',
-            quality: 'High'
+function dashboardScenarios(serverScenarios) {
+    const scenarios = {};
+    Object.entries(SCENARIO_KEYS).forEach(([key, serverKey]) => {
+        const scenario = serverScenarios[serverKey];
+        const headcount = scenario.allocation.reduce((total, line) => total + line.count, 0);
+        scenarios[key] = {
+            name: scenario.name,
+            description: scenario.description,
+            distribution: scenario.allocation.map(line => ({
+                location: APP_DATA.locations.find(l => l.name === line.location)?.id,
+                name: line.type === 'Contractor' ? `${line.location} (Contractor)` : line.location,
+                type: line.type === 'Contractor' ? 'contractor' : 'fte',
+                percentage: headcount ? line.count / headcount : 0,
+                headcount: line.count,
+                totalCost: line.total_cost
+            })),
+            totalCost: scenario.total_cost,
+            ...SCENARIO_PROFILES[key]
         };
-    }
+    });
+    return scenarios;
 }
 
 // AI Insights Generator
@@ -465,6 +389,7 @@ class OptiForceApp {
 
     showLoadingScreen(formData) {
         this.showPage('loading-screen');
+        const costGridLoaded = loadCostGrid();
         
         // Reset loading state
         document.querySelectorAll('.phase-item').forEach(item => {
@@ -499,9 +424,13 @@ class OptiForceApp {
                 currentPhase++;
                 setTimeout(processPhase, 800);
             } else {
-                // Processing complete, show dashboard
+                // Processing complete, show dashboard once the cost grid is in
                 setTimeout(() => {
-                    this.showDashboard(formData);
+                    costGridLoaded.then(() => this.showDashboard(formData), error => {
+                        console.error('Error loading cost grid:', error);
+                        alert('Error loading cost data. Please try again.');
+                        this.showPage('landing-page');
+                    });
                 }, 500);
             }
         };
@@ -510,35 +439,19 @@ class OptiForceApp {
     }
 
     showDashboard(formData) {
-        try {
-            // Generate analysis
-            currentAnalysis = {
-                formData,
-                scenarios: this.costOptimizer.generateOptimizationScenarios(
-                    formData.jobRole,
-                    formData.location,
-                    formData.headcount,
-                    formData.constraints
-                )
-            };
+        // Scenarios come from the server's first stream event; the explanation follows as tokens
+        currentAnalysis = null;
+        this.showPage('dashboard');
+        this.streamAnalysis(formData);
+    }
 
-            // Show dashboard first
-            this.showPage('dashboard');
-            
-            // Then update content
-            setTimeout(() => {
-                this.updateMetrics();
-                this.updateInsights();
-                this.createCharts();
-                this.setupCalculator();
-                this.updateScenarioDetails('cost-effective');
-            }, 100);
-            
-        } catch (error) {
-            console.error('Error showing dashboard:', error);
-            alert('Error generating analysis. Please try again.');
-            this.showPage('landing-page');
-        }
+    renderAnalysis(formData, result) {
+        currentAnalysis = { formData, scenarios: dashboardScenarios(result.scenarios), savings: result.savings };
+        this.updateMetrics();
+        this.updateInsights();
+        this.createCharts();
+        this.setupCalculator();
+        this.switchScenario('cost-effective');
     }
 
     updateMetrics() {
@@ -582,6 +495,92 @@ class OptiForceApp {
         }
     }
 
+    explanationElement() {
+        const container = document.getElementById('ai-insights');
+        const item = document.createElement('div');
+        item.className = 'insight-item';
+        item.innerHTML = '<div class="insight-title">OptiForce AI Explanation</div><div class="insight-text"></div>';
+        if (container) container.prepend(item);
+        const textElement = item.querySelector('.insight-text');
+        textElement.textContent = 'Generating explanation...';
+        return textElement;
+    }
+
+    streamAnalysis(formData) {
+        let textElement = null;
+        let received = '';
+        const showFailure = error => {
+            console.error('Error streaming analysis:', error);
+            if (!textElement) {
+                alert('Error generating analysis. Please try again.');
+                this.showPage('landing-page');
+            } else {
+                textElement.textContent = received || 'AI explanation is currently unavailable.';
+            }
+        };
+        const handleEvent = (event, data) => {
+            if (event === 'scenarios') {
+                this.renderAnalysis(formData, data);
+                textElement = this.explanationElement();
+            } else if (!textElement) {
+                return;
+            } else if (event === 'token') {
+                received += data.text;
+                textElement.textContent = received;
+            } else if (event === 'done') {
+                textElement.textContent = data.ai_explanation;
+            } else if (event === 'error') {
+                textElement.textContent = received || 'AI explanation is currently unavailable.';
+            }
+        };
+
+        const body = JSON.stringify({
+            job_role: formData.jobRole,
+            location: formData.location,
+            headcount: formData.headcount,
+            constraint: formData.constraints,
+            employment_type: formData.employment_type
+        });
+
+        fetch('/api/optimize/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body
+        }).then(async response => {
+            // Every stream slot is busy: the plain endpoint answers within its latency budget instead
+            if (response.status === 503) {
+                const fallback = await fetch('/api/optimize', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body });
+                if (!fallback.ok) throw new Error(`HTTP ${fallback.status}`);
+                const result = await fallback.json();
+                handleEvent('scenarios', result);
+                handleEvent('done', result);
+                return;
+            }
+            if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                // Server-Sent Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let event = 'message';
+                    let data = '';
+                    block.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) event = line.slice(6).trim();
+                        else if (line.startsWith('data:')) data += line.slice(5).trim();
+                    });
+                    if (data) handleEvent(event, JSON.parse(data));
+                }
+            }
+        }).catch(showFailure);
+    }
+
     createCharts() {
         if (!currentAnalysis) return;
         
@@ -607,14 +606,13 @@ class OptiForceApp {
         const distribution = scenarios['cost-effective'].distribution;
         
         container.innerHTML = distribution.map((dist, index) => {
-            const locationName = APP_DATA.locations.find(l => l.id === dist.location)?.name;
             const percentage = Math.round(dist.percentage * 100);
             
             return `
                 <div class="slider-item">
-                    <div class="slider-label">${locationName}</div>
+                    <div class="slider-label">${dist.name}</div>
                     <input type="range" class="slider" min="0" max="100" value="${percentage}" 
-                           data-location="${dist.location}" id="slider-${index}">
+                           data-location="${dist.location}" data-type="${dist.type}" id="slider-${index}">
                     <div class="slider-value">${percentage}%</div>
                 </div>
             `;
@@ -645,7 +643,7 @@ class OptiForceApp {
             
             if (headcount > 0) {
                 try {
-                    const cost = this.costOptimizer.calculateEmployeeCost(formData.jobRole, location, headcount);
+                    const cost = this.costOptimizer.calculateEmployeeCost(formData.jobRole, location, headcount, slider.dataset.type);
                     totalCost += cost.totalAnnualCost;
                 } catch (error) {
                     console.error('Error calculating cost:', error);
@@ -721,10 +719,9 @@ class OptiForceApp {
             <h4>Location Distribution</h4>
             <div class="location-distribution">
                 ${scenarioData.distribution.map(dist => {
-                    const locationName = APP_DATA.locations.find(l => l.id === dist.location)?.name;
                     return `
                         <div class="location-item">
-                            <span class="location-name">${locationName}</span>
+                            <span class="location-name">${dist.name}</span>
                             <span class="location-percentage">${Math.round(dist.percentage * 100)}%</span>
                         </div>
                     `;
@@ -0,0 +1,48 @@
+"""The cost vs risk frontier stays interactive at headcounts no block size divides
+
+    python -m pytest test_frontier.py
+"""
+
+import math
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+sys.path.insert(0, ROOT)
+
+import optiforce_app  # noqa: E402
+
+INTERACTIVE_SECONDS = 1.0
+
+
+def cold_frontier(headcount, constraint):
+    engine = optiforce_app.optimization_engine
+    engine._frontier_cache.clear()
+    engine._allocation_cache.clear()
+    started = time.perf_counter()
+    result = engine.frontier("software-engineer", "usa", headcount, constraint, "both")
+    return result, time.perf_counter() - started
+
+
+@pytest.mark.parametrize("constraint", ["cost-focused", "balanced"])
+@pytest.mark.parametrize("headcount", [997, 9973])
+def test_prime_headcount_is_interactive(headcount, constraint):
+    # Best of two runs, so a scheduling hiccup on a busy machine doesn't fail the test
+    result, seconds = min((cold_frontier(headcount, constraint) for _ in range(2)), key=lambda run: run[1])
+    assert result["resolution"] > 1
+    assert seconds < INTERACTIVE_SECONDS, f"frontier at headcount {headcount} took {seconds:.2f}s"
+
+    # The remainder is placed without breaking the country cap or the FTE minimum
+    limits = result["constraints"]
+    for point in result["frontier"]:
+        assert sum(line["count"] for line in point["allocation"]) == headcount
+        per_location = {}
+        for line in point["allocation"]:
+            per_location[line["location"]] = per_location.get(line["location"], 0) + line["count"]
+        assert max(per_location.values()) <= math.ceil(limits["max_country_share"] * headcount)
+        fte = sum(line["count"] for line in point["allocation"] if line["type"] == "FTE")
+        assert fte >= math.ceil(limits["min_fte_ratio"] * headcount - 1e-9)
@@ -0,0 +1,65 @@
+"""Greedy explanations must not change when generation starts from the cached prompt prefix
+
+Runs on the tiny stand-in model from benchmarks/tiny_model.py, built on first use:
+
+    python -m pytest test_prefix_cache.py
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("tokenizers")
+pytest.importorskip("transformers")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+os.environ["OPTIFORCE_MODEL_LOAD"] = "off"
+os.environ.pop("OPTIFORCE_INFERENCE_URL", None)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+import optiforce_app  # noqa: E402
+import tiny_model  # noqa: E402
+
+NEW_TOKENS = 24
+
+
+@pytest.fixture(scope="module")
+def service():
+    manager = optiforce_app.ModelManager(model_id=tiny_model.build(), load_mode="lazy", backend="torch")
+    manager.start()
+    assert manager.wait(), manager.error
+    service = optiforce_app.LightweightLLMService(manager)
+    service.batcher.deterministic = True
+    return service
+
+
+@pytest.fixture(scope="module")
+def prompts(service):
+    engine = optiforce_app.optimization_engine
+    prompts = []
+    for job_role, location, headcount in [("software-engineer", "usa", 25), ("data-scientist", "germany", 7),
+                                          ("hr-manager", "india", 130), ("product-manager", "portugal", 1)]:
+        scenarios = engine.generate_scenarios(job_role, location, headcount, "balanced", "both")
+        prompts.append(service.build_prompt(scenarios, job_role))
+    return prompts
+
+
+def generate(service, prompts, cached):
+    service.prefix_cache.enabled = cached
+    return service.batcher.generate_batch(prompts, [NEW_TOKENS] * len(prompts))
+
+
+def test_single_prompts_match_uncached(service, prompts):
+    for prompt in prompts:
+        hits = service.prefix_cache.hits
+        assert generate(service, [prompt], True) == generate(service, [prompt], False)
+        assert service.prefix_cache.hits > hits
+
+
+def test_padded_batch_matches_uncached(service, prompts):
+    hits = service.prefix_cache.hits
+    assert generate(service, prompts, True) == generate(service, prompts, False)
+    assert service.prefix_cache.hits > hits